@@ -0,0 +1,268 @@
+"""
+File: batch.py
+---------------
+Solves many Gang War positions in a single run, for regression runs where
+starting Python once per position would dominate the run time.
+
+Usage:
+
+	python batch.py [options] INPUT [INPUT ...]
+
+where each INPUT is one of:
+	a directory, whose files are all read;
+	a glob pattern such as 'cases/*.txt';
+	a file holding one position, or several positions one after another
+		(blank lines between them are allowed);
+	'-' to read positions from stdin.
+
+Every position uses the same format as 'input.txt' (see homework.py) and is
+parsed by the same code (see gang_io.py); a malformed file is reported as
+an error after the positions before the fault. Positions are solved by a
+pool of worker processes and results are written as soon as each one
+finishes, so their order is not the input order. By default each result is
+printed to stdout as one JSON object per line:
+
+	{"source": ..., "index": ..., "move": "C3 Raid", "board": [...],
+		"seconds": ...}
+
+With --stats, each JSON line also holds the search statistics of the
+position (see homework.SearchStats).
+
+With --out-dir, each result is instead written in the 'output.txt' format
+to <out-dir>/<input name>.out, or <input name>.<index>.out for files that
+hold more than one position. Only the first source to finish writes a
+given file: a result of another source with the same name (say
+'a/case.txt' and 'b/case.txt') is reported as an error instead of
+overwriting it.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from gang_io import InputError, format_output, read_positions
+from homework import Board, BitBoard, SearchStats, make_player_and_board
+
+BACKENDS = {'list': Board, 'bit': BitBoard}
+
+# Board backend of a worker process, whether it collects search
+# statistics and whether it formats results for --out-dir, set by
+# _init_worker.
+_board_class = Board
+_collect_stats = False
+_format_output = False
+
+
+def input_files(pattern):
+	"""Expands one INPUT argument that is not '-' into a list of files."""
+	if os.path.isdir(pattern):
+		return sorted(os.path.join(pattern, name) \
+			for name in os.listdir(pattern) \
+			if os.path.isfile(os.path.join(pattern, name)))
+	if os.path.isfile(pattern):
+		return [pattern]
+	return sorted(glob.glob(pattern))
+
+
+def source_positions(source, stream):
+	"""Parses one source, yielding its positions as they are read and
+	then, if it is malformed, the gang_io.InputError.
+	"""
+	try:
+		for position in read_positions(stream, source):
+			yield position
+	except InputError as e:
+		yield e
+
+
+def source_tasks(source, stream):
+	"""Generates the tasks of one source as its positions are read.
+
+	Whether a source holds more than one position is only known once a
+	second one is read, so the first position is held back until then, or
+	until the source ends; every later one is yielded as soon as it is
+	parsed.
+	"""
+	first = None
+	index = -1
+	for index, position in enumerate(source_positions(source, stream)):
+		if index == 0:
+			first = position
+			continue
+		if index == 1:
+			yield (source, 0, True, first)
+		yield (source, index, True, position)
+	if index == 0:
+		yield (source, 0, False, first)
+
+
+def tasks(inputs):
+	"""Generates one task per position found in the INPUT arguments.
+
+	Each source is parsed in the main process, in a single pass, so the
+	workers are sent positions ready to be searched. Positions are handed
+	out while the rest of their source is still being read, so a long
+	stream is neither held in memory nor solved only once it ends.
+
+	Args:
+		inputs: A list of INPUT arguments.
+
+	Yields:
+		Tuples (source, index, multiple, position) where source names the
+		file the position came from, index is its position within that
+		file, multiple is whether the file holds more than one position,
+		and position is its gang_io.Position. A malformed source yields a
+		last task holding the gang_io.InputError in place of a position,
+		and an INPUT matching no files yields a task holding an IOError.
+	"""
+	for pattern in inputs:
+		if pattern == '-':
+			for task in source_tasks('<stdin>', sys.stdin):
+				yield task
+			continue
+		paths = input_files(pattern)
+		if not paths:
+			yield (pattern, 0, False, IOError('no input files match ' \
+				'{}'.format(pattern)))
+		for path in paths:
+			with open(path, 'r') as f:
+				for task in source_tasks(path, f):
+					yield task
+
+
+def _init_worker(board_class, collect_stats, format_output=False):
+	global _board_class, _collect_stats, _format_output
+	_board_class = board_class
+	_collect_stats = collect_stats
+	_format_output = format_output
+
+
+def solve(task):
+	"""Solves one position.
+
+	Args:
+		task: A tuple generated by tasks.
+
+	Returns:
+		A dict with the source, index and multiple of the position and either
+		its 'move', resulting 'board' rows, 'seconds' spent, if enabled,
+		search 'stats' and, in --out-dir mode, the 'output' to write as
+		formatted by gang_io.format_output, or an 'error' message if the
+		position could not be solved.
+	"""
+	source, index, multiple, position = task
+	result = {'source': source, 'index': index, 'multiple': multiple}
+	if not isinstance(position, (InputError, IOError)) and \
+		position.remaining_spaces == 0:
+		position = InputError('no legal move: the board is full', source, \
+			position.line)
+	if isinstance(position, (InputError, IOError)):
+		result['error'] = '{}: {}'.format(type(position).__name__, position)
+		return result
+	start = time.time()
+	try:
+		board, ai = make_player_and_board(position, _board_class)
+		if _collect_stats:
+			ai.stats = SearchStats()
+		decision = ai.search(board)
+		after = board.transition(decision)
+	except Exception as e:
+		result['error'] = '{}: {}'.format(type(e).__name__, e)
+		return result
+	result['move'] = '{}'.format(decision)
+	result['board'] = [''.join(row) for row in after.state]
+	result['seconds'] = time.time() - start
+	if _collect_stats:
+		result['stats'] = ai.stats.as_dict()
+	if _format_output:
+		result['output'] = format_output(decision, after)
+	return result
+
+
+def output_path(out_dir, result):
+	"""Returns the file a result is written to in --out-dir mode."""
+	name = os.path.splitext(os.path.basename(result['source']))[0]
+	if result['source'] == '<stdin>':
+		name = 'stdin'
+	if result['multiple']:
+		name = '{}.{}'.format(name, result['index'])
+	return os.path.join(out_dir, name + '.out')
+
+
+def claim_output(result, out_dir, owners):
+	"""Turns a result into an error if its output file belongs to another
+	source.
+
+	Args:
+		result: a finished result of solve.
+		out_dir: the --out-dir directory.
+		owners: a dict mapping each output file written so far to the
+			source it was written for, which the result's file is added to.
+	"""
+	path = output_path(out_dir, result)
+	owner = owners.setdefault(path, result['source'])
+	if owner != result['source']:
+		for key in ('move', 'board', 'seconds', 'stats', 'output'):
+			result.pop(key, None)
+		result['error'] = 'OutputError: {} is already the output of ' \
+			'{}'.format(path, owner)
+
+
+def write_result(result, out_dir):
+	"""Writes one finished result to stdout or to its output file."""
+	if out_dir is None or 'error' in result:
+		sys.stdout.write(json.dumps(result) + '\n')
+		sys.stdout.flush()
+		return
+	with open(output_path(out_dir, result), 'w') as f:
+		f.write(result['output'])
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Solve many Gang War ' \
+		'positions in one process.')
+	parser.add_argument('inputs', nargs='+', metavar='INPUT', \
+		help="directory, glob, input file or '-' for stdin")
+	parser.add_argument('--out-dir', help='write output.txt-format files ' \
+		'here instead of JSON lines to stdout')
+	parser.add_argument('--workers', type=int, \
+		default=multiprocessing.cpu_count(), \
+		help='number of worker processes (default: one per core)')
+	parser.add_argument('--backend', choices=sorted(BACKENDS), \
+		default='list', help='board representation to search with')
+	parser.add_argument('--stats', action='store_true', \
+		help='include search statistics in the JSON lines')
+	args = parser.parse_args(argv)
+
+	board_class = BACKENDS[args.backend]
+	if args.out_dir is not None and not os.path.isdir(args.out_dir):
+		os.makedirs(args.out_dir)
+	failures = 0
+	owners = {}
+	if args.workers <= 1:
+		_init_worker(board_class, args.stats, args.out_dir is not None)
+		results = (solve(task) for task in tasks(args.inputs))
+		pool = None
+	else:
+		pool = multiprocessing.Pool(args.workers, _init_worker, \
+			(board_class, args.stats, args.out_dir is not None))
+		results = pool.imap_unordered(solve, tasks(args.inputs))
+	try:
+		for result in results:
+			if args.out_dir is not None and 'error' not in result:
+				claim_output(result, args.out_dir, owners)
+			if 'error' in result:
+				failures += 1
+			write_result(result, args.out_dir)
+	finally:
+		if pool is not None:
+			pool.close()
+			pool.join()
+	return 1 if failures else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
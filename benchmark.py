@@ -0,0 +1,327 @@
+"""
+File: benchmark.py
+---------------
+A reproducible benchmark of the Gang War search engines.
+
+A corpus of positions is generated with random_board from a fixed seed,
+for board sizes from 3 to 26 and several fill levels. Every engine searches
+every position to a fixed depth, recording the wall time, nodes visited,
+nodes per second and peak memory of each search. Because engines searching
+to the same depth must agree, the move each engine picks is checked against
+the others. The engines that search under a time control instead
+(TIMED_ENGINES) get --seconds per move; their moves are not checked, and
+they are compared by the nodes they search in that time.
+
+Usage:
+
+	python benchmark.py [--save-baseline FILE] [--baseline FILE] [options]
+
+With --save-baseline the results are written as JSON. With --baseline the
+results are compared against a saved run: an engine whose total time grows
+by more than --tolerance, or that visits more nodes, is reported as a
+regression, as is a timed engine whose total nodes shrink by more than
+--tolerance. The exit status is non-zero on regressions or disagreements.
+
+New engines are benchmarked by adding them to ENGINES.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from homework import Board, BitBoard, MinimaxPlayer, AlphaBetaPlayer, \
+	PVSPlayer, ParallelAlphaBetaPlayer, PVSCompetitionPlayer, MCTSPlayer, \
+	MoveOrderer, set_move_time
+from random_board import random_board
+
+SIZES = [3, 4, 5, 6, 8, 10, 13, 16, 20, 26]
+FILLS = [0.0, 0.3, 0.6, 0.9]
+DEPTH = 2
+SEED = 561
+
+# Seconds per move of the timed engines, and worker processes of the
+# parallel engine.
+SECONDS = 0.1
+PROCESSES = 2
+
+# name -> (function(my_player, opponent, depth) -> player, board class,
+#	largest board size the engine is run on)
+ENGINES = {
+	'minimax': (lambda me, opponent, depth: \
+		MinimaxPlayer(me, opponent, depth), Board, 8),
+	'alphabeta': (lambda me, opponent, depth: \
+		AlphaBetaPlayer(me, opponent, depth, orderer=MoveOrderer()), \
+		Board, 26),
+	'alphabeta-bitboard': (lambda me, opponent, depth: \
+		AlphaBetaPlayer(me, opponent, depth, orderer=MoveOrderer()), \
+		BitBoard, 26),
+	'pvs': (lambda me, opponent, depth: \
+		PVSPlayer(me, opponent, depth, orderer=MoveOrderer()), Board, 26),
+	'alphabeta-parallel': (lambda me, opponent, depth: \
+		ParallelAlphaBetaPlayer(me, opponent, depth, \
+		orderer=MoveOrderer(), processes=PROCESSES), Board, 26),
+	# timed engines, which ignore depth
+	'competition': (lambda me, opponent, depth: \
+		PVSCompetitionPlayer(me, opponent, 0.0), Board, 26),
+	'mcts': (lambda me, opponent, depth: \
+		MCTSPlayer(me, opponent, seed=SEED), Board, 26),
+}
+
+# Engines searching under a time control (see homework.set_move_time)
+# rather than to the benchmark depth.
+TIMED_ENGINES = ('competition', 'mcts')
+
+# Engines whose node counts depend on how their worker processes are
+# scheduled, so only their time and moves are compared with a baseline.
+SCHEDULED_ENGINES = ('alphabeta-parallel',)
+
+
+def generate_corpus(seed=SEED, sizes=SIZES, fills=FILLS):
+	"""Generates the benchmark positions.
+
+	Args:
+		seed: the integer seed the whole corpus is drawn from.
+		sizes: the board sizes to generate.
+		fills: the chances [0, 1) of each cell being occupied.
+
+	Returns:
+		A list of dicts, each with the 'id', 'n', 'fill', 'state', 'values'
+		and 'turn' of one position. Every position has an empty cell.
+	"""
+	rng = random.Random(seed)
+	corpus = []
+	for n in sizes:
+		for fill in fills:
+			state, values, n = random_board(n=n, fill=fill, rng=rng)
+			if all(owner != '.' for row in state for owner in row):
+				state[rng.randrange(n)][rng.randrange(n)] = '.'
+			corpus.append({
+				'id': 'n{}-fill{}'.format(n, fill),
+				'n': n,
+				'fill': fill,
+				'state': state,
+				'values': values,
+				'turn': rng.choice('XO'),
+			})
+	return corpus
+
+
+def make_board(board_class, position):
+	"""Builds a board of the given class for a corpus position."""
+	n = position['n']
+	state = [list(row) for row in position['state']]
+	values = position['values']
+	scores = {'X': 0, 'O': 0}
+	remaining_spaces = n*n
+	for row in range(n):
+		for col in range(n):
+			if state[row][col] != '.':
+				remaining_spaces -= 1
+				scores[state[row][col]] += values[row][col]
+	return board_class(n, state, values, position['turn'], \
+		remaining_spaces=remaining_spaces, scores=scores)
+
+
+def run_engine(name, position, depth, measure_memory=True, \
+	seconds=SECONDS):
+	"""Searches one position with one engine.
+
+	The timed search runs without tracemalloc, which would slow it down;
+	peak memory is measured by a second, identical search. Engines of
+	TIMED_ENGINES search for the given seconds instead of to depth, and
+	worker processes are shut down after each search.
+
+	Returns:
+		A dict of the 'move', 'seconds', 'nodes', 'nodes_per_second' and
+		'peak_kb' (None if not measured) of the search.
+	"""
+	make_player, board_class, max_n = ENGINES[name]
+	me = position['turn']
+	opponent = 'O' if me == 'X' else 'X'
+	board = make_board(board_class, position)
+
+	def new_player():
+		player = make_player(me, opponent, depth)
+		if name in TIMED_ENGINES:
+			set_move_time(player, board, seconds)
+		return player
+
+	player = new_player()
+	start = time.time()
+	try:
+		action = player.search(board)
+	finally:
+		if hasattr(player, 'close'):
+			player.close()
+	elapsed = time.time() - start
+	result = {
+		'move': '{}'.format(action),
+		'seconds': elapsed,
+		'nodes': player.nodes,
+		'nodes_per_second': player.nodes / elapsed if elapsed else 0.0,
+		'peak_kb': None,
+	}
+	if measure_memory:
+		player = new_player()
+		tracemalloc.start()
+		try:
+			player.search(board)
+		finally:
+			if hasattr(player, 'close'):
+				player.close()
+		result['peak_kb'] = tracemalloc.get_traced_memory()[1] / 1024.0
+		tracemalloc.stop()
+	return result
+
+
+def run_benchmark(engines, corpus, depth, measure_memory=True, log=None, \
+	seconds=SECONDS):
+	"""Runs every engine on every position it supports.
+
+	Returns:
+		A dict with the benchmark settings, the per-position 'results' of
+		each engine, their 'totals', and the ids of positions on which
+		engines picked different moves under 'disagreements'.
+	"""
+	results = {}
+	totals = {}
+	for name in engines:
+		max_n = ENGINES[name][2]
+		results[name] = {}
+		total = {'seconds': 0.0, 'nodes': 0, 'positions': 0}
+		for position in corpus:
+			if position['n'] > max_n:
+				continue
+			result = run_engine(name, position, depth, measure_memory, \
+				seconds)
+			results[name][position['id']] = result
+			total['seconds'] += result['seconds']
+			total['nodes'] += result['nodes']
+			total['positions'] += 1
+			if log is not None:
+				log.write('{:20} {:14} {:12} {:9.3f}s {:9d} nodes\n'.format( \
+					name, position['id'], result['move'], result['seconds'], \
+					result['nodes']))
+		if total['seconds']:
+			total['nodes_per_second'] = total['nodes'] / total['seconds']
+		else:
+			total['nodes_per_second'] = 0.0
+		totals[name] = total
+
+	disagreements = []
+	for position in corpus:
+		moves = set(results[name][position['id']]['move'] \
+			for name in engines if position['id'] in results[name] and \
+			name not in TIMED_ENGINES)
+		if len(moves) > 1:
+			disagreements.append(position['id'])
+	return {
+		'depth': depth,
+		'seconds': seconds,
+		'engines': list(engines),
+		'results': results,
+		'totals': totals,
+		'disagreements': disagreements,
+	}
+
+
+def compare(report, baseline, tolerance):
+	"""Lists the regressions of a report against a baseline report.
+
+	An engine regresses if its total time over the positions both reports
+	share grows by more than the tolerance, or if it visits more nodes
+	(unless it is one of SCHEDULED_ENGINES) or picks a different move on
+	any of them. A timed engine instead
+	regresses if its total nodes over those positions shrink by more than
+	the tolerance.
+
+	Returns:
+		A list of strings describing each regression.
+	"""
+	regressions = []
+	for name in report['engines']:
+		if name not in baseline['results']:
+			continue
+		old = baseline['results'][name]
+		new = report['results'][name]
+		shared = [key for key in new if key in old]
+		if name in TIMED_ENGINES:
+			old_nodes = sum(old[key]['nodes'] for key in shared)
+			new_nodes = sum(new[key]['nodes'] for key in shared)
+			if new_nodes < old_nodes * (1 - tolerance):
+				regressions.append('{}: {} -> {} nodes'.format(name, \
+					old_nodes, new_nodes))
+			continue
+		old_seconds = sum(old[key]['seconds'] for key in shared)
+		new_seconds = sum(new[key]['seconds'] for key in shared)
+		if old_seconds and new_seconds > old_seconds * (1 + tolerance):
+			regressions.append('{}: {:.3f}s -> {:.3f}s'.format(name, \
+				old_seconds, new_seconds))
+		for key in shared:
+			if name not in SCHEDULED_ENGINES and \
+				new[key]['nodes'] > old[key]['nodes']:
+				regressions.append('{} {}: {} -> {} nodes'.format(name, key, \
+					old[key]['nodes'], new[key]['nodes']))
+			if new[key]['move'] != old[key]['move']:
+				regressions.append('{} {}: move {} -> {}'.format(name, key, \
+					old[key]['move'], new[key]['move']))
+	return regressions
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Benchmark the Gang War ' \
+		'search engines on a seeded corpus of positions.')
+	parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), \
+		default=sorted(ENGINES), help='engines to run (default: all)')
+	parser.add_argument('--depth', type=int, default=DEPTH, \
+		help='search depth (default: %(default)s)')
+	parser.add_argument('--seconds', type=float, default=SECONDS, \
+		help='per-move time of the timed engines (default: %(default)s)')
+	parser.add_argument('--seed', type=int, default=SEED, \
+		help='corpus seed (default: %(default)s)')
+	parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, \
+		help='board sizes (default: %(default)s)')
+	parser.add_argument('--fills', type=float, nargs='+', default=FILLS, \
+		help='fill levels (default: %(default)s)')
+	parser.add_argument('--no-memory', action='store_true', \
+		help='skip the peak memory measurement')
+	parser.add_argument('--save-baseline', metavar='FILE', \
+		help='write the results as JSON to FILE')
+	parser.add_argument('--baseline', metavar='FILE', \
+		help='compare the results against a saved JSON baseline')
+	parser.add_argument('--tolerance', type=float, default=0.1, \
+		help='allowed relative growth of total time (default: %(default)s)')
+	args = parser.parse_args(argv)
+
+	corpus = generate_corpus(args.seed, args.sizes, args.fills)
+	report = run_benchmark(args.engines, corpus, args.depth, \
+		not args.no_memory, log=sys.stderr, seconds=args.seconds)
+	report['seed'] = args.seed
+	for name in args.engines:
+		total = report['totals'][name]
+		print('{:20} {:3d} positions {:9.3f}s {:10d} nodes {:10.0f} ' \
+			'nodes/s'.format(name, total['positions'], total['seconds'], \
+			total['nodes'], total['nodes_per_second']))
+	status = 0
+	if report['disagreements']:
+		print('engines disagree on: {}'.format( \
+			', '.join(report['disagreements'])))
+		status = 1
+	if args.save_baseline:
+		with open(args.save_baseline, 'w') as f:
+			json.dump(report, f, indent=1, sort_keys=True)
+	if args.baseline:
+		with open(args.baseline, 'r') as f:
+			baseline = json.load(f)
+		regressions = compare(report, baseline, args.tolerance)
+		for regression in regressions:
+			print('regression: {}'.format(regression))
+		if regressions:
+			status = 1
+	return status
+
+
+if __name__ == '__main__':
+	sys.exit(main())
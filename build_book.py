@@ -0,0 +1,129 @@
+"""
+File: build_book.py
+---------------
+Precomputes opening books for the competition player (see
+homework.OpeningBook).
+
+Usage:
+
+	python build_book.py [options] BOOK INPUT [INPUT ...]
+
+where each INPUT is a file in the 'input.txt' format (see homework.py) whose
+values grid games will be played on; its mode, depth and board are ignored.
+For every grid, the empty board and every position reachable from it in
+fewer than --plies moves are searched to --depth with principal variation
+search, with either player moving first, and the results are stored in
+BOOK. An existing BOOK is extended rather than replaced, and positions it
+already holds at the requested depth are not searched again, so an
+interrupted run can simply be restarted.
+
+The book is then used by passing it to homework.py:
+
+	python homework.py --book BOOK
+"""
+import argparse
+import os
+import sys
+import time
+
+from homework import Board, PVSPlayer, MoveOrderer, OpeningBook, \
+	BOOK_SLOTS, generate_player_and_board
+
+DEPTH = 5
+PLIES = 2
+
+
+def positions(values, plies):
+	"""Generates the opening positions of a values grid.
+
+	Args:
+		values: the 2D grid of cell values of the game.
+		plies: the number of moves to look past the empty board.
+
+	Yields:
+		Board objects of the empty board with X and then O to move, and of
+		every position reachable from them in fewer than plies moves.
+		Each position is produced once.
+	"""
+	n = len(values)
+	seen = set()
+	for first in ('X', 'O'):
+		layer = [Board(n, [['.'] * n for i in range(n)], values, first)]
+		for ply in range(plies):
+			next_layer = []
+			for board in layer:
+				if board.zobrist in seen:
+					continue
+				seen.add(board.zobrist)
+				yield board
+				if ply + 1 < plies:
+					for action in board.actions():
+						next_layer.append(board.transition(action))
+			layer = next_layer
+
+
+def build(book, values, depth, plies, log=None):
+	"""Adds the opening positions of one values grid to a book.
+
+	Returns:
+		A tuple (searched, stored) of the number of positions searched and
+		the number of records written.
+	"""
+	players = {}
+	searched = 0
+	stored = 0
+	for board in positions(values, plies):
+		entry = book.probe(board)
+		if entry is not None and entry[2] >= depth:
+			continue
+		if board.turn not in players:
+			players[board.turn] = PVSPlayer(board.turn, board.opponent, \
+				depth, orderer=MoveOrderer())
+		player = players[board.turn]
+		start = time.time()
+		action = player.search(board)
+		searched += 1
+		if book.store(board, depth, player.value, action):
+			stored += 1
+		if log is not None:
+			log.write('{} to move, {} empty: {} ({}) {:.2f}s\n'.format( \
+				board.turn, board.remaining_spaces, action, player.value, \
+				time.time() - start))
+	return searched, stored
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Precompute a Gang War ' \
+		'opening book for the values grids of some input files.')
+	parser.add_argument('book', metavar='BOOK', help='book file to create ' \
+		'or extend')
+	parser.add_argument('inputs', nargs='+', metavar='INPUT', \
+		help="input files in the 'input.txt' format")
+	parser.add_argument('--depth', type=int, default=DEPTH, \
+		help='search depth of each position (default: %(default)s)')
+	parser.add_argument('--plies', type=int, default=PLIES, \
+		help='number of opening moves to cover (default: %(default)s)')
+	parser.add_argument('--slots', type=int, default=BOOK_SLOTS, \
+		help='records in a new book file (default: %(default)s)')
+	args = parser.parse_args(argv)
+
+	if os.path.exists(args.book):
+		book = OpeningBook(args.book, writable=True)
+	else:
+		book = OpeningBook.create(args.book, args.slots)
+	try:
+		for path in args.inputs:
+			board = generate_player_and_board(path)[0]
+			searched, stored = build(book, board.values, args.depth, \
+				args.plies, log=sys.stderr)
+			print('{}: {} positions searched, {} stored'.format(path, \
+				searched, stored))
+		print('{}: {} of {} records used'.format(args.book, len(book), \
+			book.slots))
+	finally:
+		book.close()
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
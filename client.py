@@ -0,0 +1,160 @@
+"""
+File: client.py
+---------------
+A client for the match server (see server.py) to play or script games.
+
+Usage:
+
+	python client.py [--host HOST] [--port PORT | --unix PATH] [SCRIPT]
+
+Protocol commands are read from SCRIPT, or typed at the terminal if no
+SCRIPT is given, and sent to the server; every message the server sends
+back is printed, with STATE messages drawn as boards. A line holding just
+a move such as 'B2 S' is sent as a MOVE in the last match started. Once
+all input has been sent, the client waits for every match it started or
+watched to end and exits, so a script of NEW commands plays a batch of
+bot v. bot games.
+"""
+import argparse
+import asyncio
+import sys
+
+
+def draw_state(words):
+	"""Returns the lines of a STATE message drawn as a board."""
+	match_id, turn, x_score, o_score, rows = words[1:6]
+	rows = rows.split('/')
+	lines = ['match {}: X {} O {}, {} to move'.format(match_id, x_score, \
+		o_score, turn)]
+	lines.append('   ' + ''.join(chr(65 + col) for col in range(len(rows))))
+	for row, cells in enumerate(rows):
+		lines.append('{:2} {}'.format(row + 1, cells))
+	return lines
+
+
+class Session:
+	"""The state of a client connection.
+
+	Attributes:
+		reader, writer: the streams of the connection.
+		matches: a dict mapping the ids of the matches the client follows
+			to True once they are over.
+		pending: an integer count of the commands sent that the server has
+			not answered with OK or ERROR yet.
+		answered: an asyncio.Event set whenever pending drops to 0.
+		all_sent: an asyncio.Event set once all input has been sent.
+	"""
+	def __init__(self, reader, writer):
+		self.reader = reader
+		self.writer = writer
+		self.matches = {}
+		self.pending = 0
+		self.answered = asyncio.Event()
+		self.answered.set()
+		self.all_sent = asyncio.Event()
+
+	def done(self):
+		"""Returns True once nothing more is expected from the server."""
+		return self.all_sent.is_set() and self.pending == 0 and \
+			all(self.matches.values())
+
+	async def print_messages(self):
+		"""Prints server messages until the session is done."""
+		while not self.done():
+			line = await self.reader.readline()
+			if not line:
+				return
+			words = line.decode('ascii').split()
+			if not words:
+				continue
+			if words[0] == 'STATE' and len(words) >= 6:
+				print('\n'.join(draw_state(words)))
+			else:
+				print(' '.join(words))
+			if words[0] in ('OK', 'ERROR'):
+				if words[0] == 'OK' and len(words) > 1:
+					self.matches[words[1]] = False
+				self.pending -= 1
+				if self.pending == 0:
+					self.answered.set()
+			elif words[0] == 'OVER':
+				self.matches[words[1]] = True
+
+	async def send_commands(self, lines):
+		"""Sends input lines to the server.
+
+		Args:
+			lines: an iterable of input lines; read in a thread so typing
+				does not hold up the printing of server messages.
+		"""
+		loop = asyncio.get_running_loop()
+		iterator = iter(lines)
+		while True:
+			line = await loop.run_in_executor(None, next, iterator, None)
+			if line is None:
+				break
+			words = line.split()
+			if not words:
+				continue
+			if words[0].upper() == 'QUIT':
+				break
+			if len(words) == 2 and words[0][:1].isalpha() and \
+				words[0][1:].isdigit():
+				# a bare move is played in the last match started, which
+				# is only known once every NEW sent has been answered
+				await self.answered.wait()
+				if self.matches:
+					words = ['MOVE', list(self.matches)[-1]] + words
+			elif words[0].upper() == 'WATCH' and len(words) > 1:
+				self.matches[words[1]] = False
+			self.pending += 1
+			self.answered.clear()
+			self.writer.write((' '.join(words) + '\n').encode('ascii'))
+			await self.writer.drain()
+		self.all_sent.set()
+
+
+async def run(args, lines):
+	if args.unix is not None:
+		reader, writer = await asyncio.open_unix_connection(args.unix)
+	else:
+		reader, writer = await asyncio.open_connection(args.host, args.port)
+	session = Session(reader, writer)
+	printer = asyncio.ensure_future(session.print_messages())
+	await session.send_commands(lines)
+	if session.done():
+		printer.cancel()
+	try:
+		await printer
+	except asyncio.CancelledError:
+		pass
+	writer.write(b'QUIT\n')
+	writer.close()
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Play or script Gang War ' \
+		'matches on a match server.')
+	parser.add_argument('script', nargs='?', metavar='SCRIPT', \
+		help='file of protocol commands (default: read the terminal)')
+	parser.add_argument('--host', default='127.0.0.1', \
+		help='server address (default: %(default)s)')
+	parser.add_argument('--port', type=int, default=5610, \
+		help='server TCP port (default: %(default)s)')
+	parser.add_argument('--unix', metavar='PATH', \
+		help='connect to a Unix socket instead of TCP')
+	args = parser.parse_args(argv)
+	if args.script is not None:
+		with open(args.script, 'r') as f:
+			lines = f.readlines()
+	else:
+		lines = sys.stdin
+	try:
+		asyncio.run(run(args, lines))
+	except KeyboardInterrupt:
+		pass
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+File: gang_io.py
+---------------
+Reads positions in the 'input.txt' format and writes moves in the
+'output.txt' format (both described in homework.py).
+
+Input is read in a single pass over its lines, so a stream holding
+thousands of positions back to back (blank lines between them are
+allowed) is parsed without first reading it all into memory. Each position
+is checked as it is read and a malformed one raises InputError naming the
+source and line at fault, e.g.
+
+	cases.txt:7: expected 5 cell values, got 4
+
+Scores and remaining spaces are totalled while the board rows are read,
+and rows are kept as the strings they were read as, which Board and
+BitBoard accept as they are.
+"""
+import sys
+
+MODES = ('MINIMAX', 'ALPHABETA', 'PVS', 'COMPETITION')
+PLAYERS = ('X', 'O')
+MAX_N = 26
+
+
+class InputError(ValueError):
+	"""Raised when input is not in the 'input.txt' format.
+
+	Attributes:
+		message: a string saying what is wrong.
+		source: a string naming the file the input came from.
+		line: the integer line number [1, ...] at fault, or None at the end
+			of the input.
+	"""
+	def __init__(self, message, source='<input>', line=None):
+		if line is None:
+			where = '{}: end of input'.format(source)
+		else:
+			where = '{}:{}'.format(source, line)
+		ValueError.__init__(self, '{}: {}'.format(where, message))
+		self.message = message
+		self.source = source
+		self.line = line
+
+	def __reduce__(self):
+		# rebuilt from its parts when sent to or from worker processes
+		return (InputError, (self.message, self.source, self.line))
+
+
+class Position:
+	"""One position read from the input.
+
+	Attributes:
+		n: an integer [1,26] representing the height and width of the board.
+		mode: the search mode, one of MODES.
+		player: the player to move, 'X' or 'O'.
+		opponent: the other player.
+		depth: the integer search depth, or None in COMPETITION mode.
+		cpu_remaining: the float seconds of CPU time left in COMPETITION
+			mode, else None.
+		values: a 2D list of the integer values of the cells.
+		state: a list of n strings, each one row of 'X', 'O' and '.' chars.
+		scores: a dict mapping each player to the total value of their
+			cells.
+		remaining_spaces: the number of empty cells.
+		source: the name of the input the position was read from.
+		line: the line number of its first line.
+	"""
+	__slots__ = ('n', 'mode', 'player', 'opponent', 'depth', \
+		'cpu_remaining', 'values', 'state', 'scores', 'remaining_spaces', \
+		'source', 'line')
+
+	def __init__(self, n, mode, player, depth, cpu_remaining, values, \
+		state, scores, remaining_spaces, source='<input>', line=1):
+		self.n = n
+		self.mode = mode
+		self.player = player
+		self.opponent = 'O' if player == 'X' else 'X'
+		self.depth = depth
+		self.cpu_remaining = cpu_remaining
+		self.values = values
+		self.state = state
+		self.scores = scores
+		self.remaining_spaces = remaining_spaces
+		self.source = source
+		self.line = line
+
+
+def read_positions(stream, source='<input>'):
+	"""Parses every position of an input stream.
+
+	Args:
+		stream: an iterable of lines, such as an open file, sys.stdin or a
+			list of strings.
+		source: a string naming the stream in error messages.
+
+	Yields:
+		A Position for each position in the stream, in order.
+
+	Raises:
+		InputError: at the first malformed position.
+	"""
+	lines = enumerate(stream, 1)
+
+	def next_line(what):
+		entry = next(lines, None)
+		if entry is None:
+			raise InputError('missing {}'.format(what), source)
+		return entry[0], entry[1].strip()
+
+	for start, line in lines:
+		line = line.strip()
+		if not line:
+			continue
+		try:
+			n = int(line)
+		except ValueError:
+			n = 0
+		if not 1 <= n <= MAX_N:
+			raise InputError('expected the board size N from 1 to {}, ' \
+				'got {!r}'.format(MAX_N, line), source, start)
+
+		number, mode = next_line('the mode line')
+		if mode not in MODES:
+			raise InputError('expected a mode of {}, got {!r}'.format( \
+				', '.join(MODES), mode), source, number)
+		number, player = next_line('the player line')
+		if player not in PLAYERS:
+			raise InputError("expected the player 'X' or 'O', got " \
+				'{!r}'.format(player), source, number)
+		number, limit = next_line('the depth line')
+		depth = cpu_remaining = None
+		try:
+			if mode == 'COMPETITION':
+				cpu_remaining = float(limit)
+				valid = cpu_remaining >= 0
+			else:
+				depth = int(limit)
+				valid = depth >= 0
+		except ValueError:
+			valid = False
+		if not valid:
+			raise InputError('expected a {} from 0 up, got {!r}'.format( \
+				'number of seconds' if mode == 'COMPETITION' else 'depth', \
+				limit), source, number)
+
+		values = []
+		for row in range(n):
+			number, line = next_line('row {} of the cell values'.format( \
+				row + 1))
+			try:
+				cells = [int(value) for value in line.split()]
+			except ValueError:
+				raise InputError('expected integer cell values, got ' \
+					'{!r}'.format(line), source, number)
+			if len(cells) != n:
+				raise InputError('expected {} cell values, got {}'.format(n, \
+					len(cells)), source, number)
+			values.append(cells)
+
+		state = []
+		scores = {'X': 0, 'O': 0}
+		remaining_spaces = 0
+		for row in range(n):
+			number, line = next_line('row {} of the board'.format(row + 1))
+			if len(line) != n or line.strip('XO.'):
+				raise InputError("expected {} of 'X', 'O' and '.', got " \
+					'{!r}'.format(n, line), source, number)
+			empty = line.count('.')
+			remaining_spaces += empty
+			if empty < n:
+				for value, owner in zip(values[row], line):
+					if owner != '.':
+						scores[owner] += value
+			state.append(line)
+
+		yield Position(n, mode, player, depth, cpu_remaining, values, state, \
+			scores, remaining_spaces, source, start)
+
+
+def read_position(stream, source='<input>'):
+	"""Parses an input stream holding a single position.
+
+	Returns:
+		The Position of the stream.
+
+	Raises:
+		InputError: if the stream is malformed, empty, or holds anything
+			after the position but blank lines.
+	"""
+	positions = read_positions(stream, source)
+	for position in positions:
+		for extra in positions:
+			raise InputError('unexpected input after the position', source, \
+				extra.line)
+		return position
+	raise InputError('no position', source)
+
+
+def format_output(action, board):
+	"""Formats a move and the board it leads to as in 'output.txt'.
+
+	The rows are laid out in one list of chars that is joined once, so no
+	string is built per row.
+
+	Args:
+		action: the Action played.
+		board: the Board after action.
+
+	Returns:
+		A string of the move line followed by the rows of the board.
+	"""
+	n = board.n
+	cells = board.cells
+	chars = ['\n'] * (n * (n + 1))
+	for col in range(n):
+		chars[col + 1::n + 1] = cells[col::n]
+	return '{}'.format(action) + ''.join(chars)
+
+
+def write_output(stream, action, board):
+	"""Writes a move and the board it leads to to a stream in the
+	'output.txt' format (see format_output).
+	"""
+	stream.write(format_output(action, board))
+
+
+if __name__ == '__main__':
+	# checks input files: python gang_io.py [INPUT ...], '-' for stdin
+	status = 0
+	for path in sys.argv[1:] or ['-']:
+		try:
+			if path == '-':
+				count = sum(1 for position in read_positions(sys.stdin, \
+					'<stdin>'))
+			else:
+				with open(path, 'r') as f:
+					count = sum(1 for position in read_positions(f, path))
+			print('{}: {} positions'.format(path, count))
+		except (IOError, InputError) as e:
+			print(e)
+			status = 1
+	sys.exit(status)
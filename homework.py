@@ -22,12 +22,14 @@ game state as described by 'input.txt', formatted as follows:
 
 where:
 <N> is the board width and height, e.g. N=5 becomes a 5x5 board.
-<MODE> is 'MINIMAX', 'ALPHABETA', or 'COMPETITION' and describes if the
-	bot will use the minimax algorithm with or without alpha-beta pruning
-	or the experimental optimized algorithm for bot v. bot competitions.
+<MODE> is 'MINIMAX', 'ALPHABETA', 'PVS', or 'COMPETITION' and describes if
+	the bot will use the minimax algorithm with or without alpha-beta
+	pruning, principal variation search, or the experimental optimized
+	algorithm for bot v. bot competitions.
 <YOUPLAY> is 'X' or 'O' and describes the player the bot will play as
-<DEPTH> is the maximum depth of the search tree. This input is ignored in
-	competition mode.
+<DEPTH> is the maximum depth of the search tree. In competition mode this
+	line instead holds the seconds of CPU time the bot has left for the
+	rest of the game, which is used to budget time for each move.
 <... CELL VALUES ...> contains N lines each containing N positive integers
 	separated by spaces. Each integer represents the value of that board cell.
 <... BOARD STATE ...> contains N lines each with N characters 'X', 'O', or '.'
@@ -51,6 +53,78 @@ modularized so that they can be applied in different applications such as
 human v. human I/O games, human v. bot I/O games, and bot v. bot training
 applications.
 """
+import hashlib
+import math
+import mmap
+import multiprocessing
+import random
+import struct
+import sys
+import threading
+import time
+
+import gang_io
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+# Fraction of the per-move time budget the competition player lets itself
+# use, leaving headroom for reading input and writing output.
+TIME_SAFETY_FACTOR = 0.9
+
+# Default number of slots in a player's transposition table.
+TT_SIZE = 2**20
+
+# Width of the null windows used by PVSPlayer: the smallest possible
+# difference between two evaluations, which are integer score differences.
+NULL_WINDOW = 1
+
+# Half-width of the aspiration window CompetitionPlayer searches around the
+# previous iteration's value. Roughly the value of an average cell.
+ASPIRATION_WINDOW = 25
+
+# Seed for the Zobrist keys, fixed so positions hash the same in every run.
+ZOBRIST_SEED = 561
+
+# Number of empty cells at which CompetitionPlayer stops searching to a
+# depth limit and solves the rest of the game exactly, and the share of a
+# move's time budget the solver may use before the depth-limited search
+# takes over again.
+ENDGAME_CELLS = 10
+ENDGAME_TIME_SHARE = 0.5
+
+# Number of records in a new opening book file, the fraction of them that
+# may be filled, and the depth a competition search has to complete for
+# its result to be written back to the book.
+BOOK_SLOTS = 2**16
+BOOK_MAX_LOAD = 0.75
+BOOK_WRITE_DEPTH = 4
+
+# Weights of the raid exposure and territory terms of NumpyEvaluator,
+# relative to material.
+THREAT_WEIGHT = 0.5
+TERRITORY_WEIGHT = 0.25
+
+# Nodes the quiescence search may visit below each leaf of the main search
+# when it is turned on (see AlphaBetaPlayer.quiesce).
+QUIESCENCE_NODES = 32
+
+# Playouts an MCTSPlayer runs per move when it has no time budget, and
+# the exploration constant of its UCT selection. Playout rewards are final
+# margins scaled by the total value of the board, so they rarely stray far
+# from 0.5 and the constant is much smaller than the textbook sqrt(2).
+MCTS_ITERATIONS = 2000
+UCT_EXPLORATION = 0.05
+
+# Nodes a Ponderer searches between checks of whether the opponent has
+# moved, when that check is not free (see Ponderer.ponder).
+PONDER_CHECK_NODES = 1024
+
+# Seconds between the stack samples a SearchProfiler takes.
+PROFILE_INTERVAL = 0.001
+
 
 class Action:
 	"""A class for storing a possible in-game action.
@@ -61,6 +135,11 @@ class Action:
 	model to change from one board state to another (see the 'transition'
 	function of the Board class).
 
+	Actions are what the players return and what is read and written as
+	I/O. Inside a search, moves are instead plain ints packed by encode
+	(the cell index times 2, plus 1 for a Raid), which cost no object to
+	create and serve as cheap dict keys; see Board.generate_moves.
+
 	Attributes:
 		piece_position: a tuple representing the cell to be occupied.
 			piece_position[0] is the row of the game board, piece_position[1]
@@ -70,6 +149,8 @@ class Action:
 		player: a character representing which player is making this move
 			(either 'X' or 'O').
 	"""
+	__slots__ = ('piece_position', 'type', 'player')
+
 	def __init__(self, piece_position, action_type, player):
 		self.piece_position = piece_position
 		self.type = action_type
@@ -90,24 +171,444 @@ class Action:
 		return '{} {}'.format(self.string_position(), self.type)
 
 	def __eq__(self, other):
+		if not isinstance(other, Action):
+			return NotImplemented
 		return self.piece_position == other.piece_position and \
 		self.type == other.type and \
 		self.player == other.player
 
+	def __hash__(self):
+		return hash((self.piece_position, self.type, self.player))
+
+	def encode(self, n):
+		"""Packs the action into an int (cell index * 2 + 1 for a Raid), the
+		form moves take inside a search and between processes. The player
+		is left out since it is always the player to move on the board the
+		action is applied to.
+		"""
+		row, col = self.piece_position
+		return (row*n + col)*2 + (self.type == 'R')
+
+	@classmethod
+	def decode(cls, code, n, player):
+		"""Rebuilds an Action packed by encode."""
+		if code & 1:
+			action_type = 'R'
+		else:
+			action_type = 'S'
+		return cls(divmod(code >> 1, n), action_type, player)
+
+
+class ZobristKeys:
+	"""Random 64-bit keys for Zobrist hashing of n x n boards.
+
+	A board's hash is the XOR of the key for every occupied (cell, owner)
+	pair, XORed with the turn key when it is O's move. Placing or flipping
+	a piece then only costs one or two XORs, so the hash can be carried
+	along through Board.apply and Board.transition.
+
+	Attributes:
+		cells: a dict mapping a player ('X' or 'O') to a flat list of keys,
+			one per cell of the board in row-major order.
+		turn: the key XORed in when it is O's turn to move.
+	"""
+	_by_size = {}
+
+	def __init__(self, n, seed=ZOBRIST_SEED):
+		rng = random.Random(seed * 31 + n)
+		self.cells = {}
+		for player in ('X', 'O'):
+			self.cells[player] = [rng.getrandbits(64) for i in range(n*n)]
+		self.turn = rng.getrandbits(64)
+
+	@classmethod
+	def for_size(cls, n):
+		"""Returns the shared keys for n x n boards, creating them once."""
+		if n not in cls._by_size:
+			cls._by_size[n] = cls(n)
+		return cls._by_size[n]
+
+	def hash(self, cells, turn):
+		"""Computes the Zobrist hash of a board from scratch.
+
+		Args:
+			cells: a flat row-major list of 'X', 'O' and '.' cells.
+			turn: a char ('X' or 'O') of the player to move.
+
+		Returns:
+			The 64-bit integer hash of the position.
+		"""
+		h = 0
+		for index, owner in enumerate(cells):
+			if owner != '.':
+				h ^= self.cells[owner][index]
+		if turn == 'O':
+			h ^= self.turn
+		return h
+
+
+class TranspositionTable:
+	"""A fixed-size cache of search results keyed by Zobrist hash.
+
+	Each slot holds one entry (key, depth, value, flag, best_move,
+	generation), where best_move is a move code or None. depth is how many
+	plies below the position were searched, and flag says whether value is
+	the exact backed-up value (EXACT), only a lower bound because the
+	search failed high (LOWER), or only an upper bound because it failed
+	low (UPPER). Values are from the point of view of the player owning
+	the table, so a table must not be shared between players or between
+	games played on different cell values.
+
+	When two positions map to the same slot, the deeper result is kept,
+	unless the stored entry is left over from an earlier search, in which
+	case it is always replaced.
+
+	Attributes:
+		max_entries: an integer of the number of slots in the table.
+		generation: an integer bumped at the start of every search.
+		probes: an integer count of lookups.
+		hits: an integer count of lookups that found their position.
+	"""
+	EXACT = 0
+	LOWER = 1
+	UPPER = 2
+
+	def __init__(self, max_entries=TT_SIZE):
+		self.max_entries = max_entries
+		self.entries = {}
+		self.generation = 0
+		self.probes = 0
+		self.hits = 0
+
+	def __len__(self):
+		return len(self.entries)
+
+	def new_search(self):
+		"""Marks every stored entry as belonging to a previous search."""
+		self.generation += 1
+
+	def clear(self):
+		self.entries.clear()
+
+	def probe(self, key):
+		"""Returns the entry stored for a position, or None if absent."""
+		self.probes += 1
+		entry = self.entries.get(key % self.max_entries)
+		if entry is not None and entry[0] == key:
+			self.hits += 1
+			return entry
+		return None
+
+	def store(self, key, depth, value, flag, best_move):
+		"""Records a search result, subject to the replacement policy."""
+		slot = key % self.max_entries
+		old = self.entries.get(slot)
+		if old is None or old[0] == key or old[5] != self.generation \
+			or depth >= old[1]:
+			self.entries[slot] = (key, depth, value, flag, best_move, \
+				self.generation)
+
+
+class OpeningBook:
+	"""A persistent cache of searched positions, stored on disk.
+
+	Competition games start from an empty board, so the first positions of
+	games played on the same values grid are the same every time. A book
+	remembers the move and value found for such positions by a deep search
+	so later runs can play them without searching.
+
+	The file is a header followed by a fixed number of fixed-size records,
+	read and written through mmap so that opening a book costs nothing and
+	a lookup only touches the records it reads. Records form an open
+	addressing hash table keyed by a 64-bit hash of the values grid, the
+	cells and the turn, probed linearly from key % slots. Each record
+	holds the key, the value of the position for the player to move, the
+	depth it was searched to and the move as encoded by Action.encode. A
+	key of 0 marks an empty record.
+
+	Values come from the evaluation of the player that stored them, so a
+	book should only be shared by players that evaluate the same way.
+
+	Attributes:
+		path: the string path of the book file.
+		writable: True if the book was opened for writing.
+		slots: an integer of the number of records in the file.
+	"""
+	MAGIC = b'GWBOOK01'
+	# magic, slots, records in use
+	HEADER = struct.Struct('<8sII')
+	# key, value, depth, move
+	RECORD = struct.Struct('<QiHI')
+
+	def __init__(self, path, writable=False):
+		"""Opens an existing book file.
+
+		Raises:
+			ValueError: The file is not an opening book.
+		"""
+		self.path = path
+		self.writable = writable
+		self._file = open(path, 'r+b' if writable else 'rb')
+		access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+		self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+		if len(self._map) < self.HEADER.size:
+			self.close()
+			raise ValueError('{} is not an opening book'.format(path))
+		magic, self.slots, count = self.HEADER.unpack_from(self._map, 0)
+		size = self.HEADER.size + self.slots * self.RECORD.size
+		if magic != self.MAGIC or len(self._map) != size:
+			self.close()
+			raise ValueError('{} is not an opening book'.format(path))
+		self._values = None
+		self._values_key = None
+
+	@classmethod
+	def create(cls, path, slots=BOOK_SLOTS):
+		"""Creates an empty book file, replacing any file at path, and
+		opens it for writing.
+		"""
+		with open(path, 'wb') as f:
+			f.write(cls.HEADER.pack(cls.MAGIC, slots, 0))
+			f.truncate(cls.HEADER.size + slots * cls.RECORD.size)
+		return cls(path, writable=True)
+
+	def close(self):
+		self._map.close()
+		self._file.close()
+
+	def __len__(self):
+		return self.HEADER.unpack_from(self._map, 0)[2]
+
+	def key(self, state):
+		"""Returns the 64-bit book key of a position."""
+		if self._values is not state.values:
+			text = repr(state.values).encode('ascii')
+			digest = hashlib.blake2b(text, digest_size=8).digest()
+			self._values_key = struct.unpack('<Q', digest)[0]
+			self._values = state.values
+		# 0 marks empty records, so no position may have it as its key
+		return (self._values_key ^ state.zobrist) or 1
+
+	def find(self, key):
+		"""Returns the file offset of the record holding key, or of the
+		empty record where it would go, or None if the book is full.
+		"""
+		record = self.RECORD
+		slot = key % self.slots
+		for i in range(self.slots):
+			offset = self.HEADER.size + slot * record.size
+			stored = record.unpack_from(self._map, offset)[0]
+			if stored == key or stored == 0:
+				return offset
+			slot = (slot + 1) % self.slots
+		return None
+
+	def probe(self, state):
+		"""Looks a position up.
+
+		Args:
+			state: A Board object of the position.
+
+		Returns:
+			A tuple (action, value, depth) of the stored Action, its value
+			for the player to move and the depth it was searched to, or
+			None if the position is not in the book.
+		"""
+		key = self.key(state)
+		offset = self.find(key)
+		if offset is None:
+			return None
+		stored, value, depth, move = self.RECORD.unpack_from(self._map, offset)
+		if stored != key:
+			return None
+		return state.action(state.oriented_move(move)), value, depth
+
+	def store(self, state, depth, value, action):
+		"""Records a searched position, unless the book already holds a
+		result at least as deep for it or is too full to take new ones.
+
+		Args:
+			state: A Board object of the position.
+			depth: An integer of the depth the position was searched to.
+			value: The integer value of the position for the player to move.
+			action: The Action the search chose.
+
+		Returns:
+			True if the record was written.
+		"""
+		key = self.key(state)
+		offset = self.find(key)
+		if offset is None:
+			return False
+		stored, old_value, old_depth, old_move = \
+			self.RECORD.unpack_from(self._map, offset)
+		count = len(self)
+		if stored == key:
+			if old_depth >= depth:
+				return False
+		elif count >= self.slots * BOOK_MAX_LOAD:
+			# keep enough records empty for lookups to end quickly
+			return False
+		else:
+			count += 1
+		self.RECORD.pack_into(self._map, offset, key, int(value), depth, \
+			state.canonical_move(action.encode(state.n)))
+		self.HEADER.pack_into(self._map, 0, self.MAGIC, self.slots, count)
+		return True
+
+
+def hint_first(moves, count, hint):
+	"""Puts a previously found best move in front of a position's moves.
+
+	The other moves keep their order.
+
+	Args:
+		moves: a move buffer whose first count entries are the legal move
+			codes of a position.
+		count: an integer of the moves in the buffer.
+		hint: the move code stored in the transposition table for the same
+			position, or None. It must be one of the moves.
+	"""
+	if hint is None:
+		return
+	index = moves.index(hint, 0, count)
+	moves[1:index + 1] = moves[:index]
+	moves[0] = hint
+
+
+class Geometry:
+	"""The fixed layout of one game, shared by every board of the game.
+
+	Everything about a board that never changes during a game is computed
+	once here, so the move generator and apply can look neighbors and
+	values up instead of recomputing them at every node.
+
+	Attributes:
+		n: an integer of the height and width of the board.
+		values: the 2D grid of cell values the geometry was built from.
+		flat_values: a tuple of the cell values in Board.cells order.
+		positions: a tuple of the (row, col) of each cell index.
+		neighbors: a tuple holding, for each cell index, the tuple of the
+			indices of its adjacent cells.
+		adjacent: neighbors as (row, col) tuples, for adjacent_positions.
+		raid_gains: a tuple holding, for each cell index, the tuple of
+			(adjacent index, value) pairs of the cells a Raid there could
+			capture and what capturing each one earns.
+		keys: the ZobristKeys for boards of this size.
+		symmetries: a tuple of the rotations and reflections of the board
+			that leave the values grid unchanged, identity first, each a
+			tuple giving the index every cell index is moved to. Empty if
+			the identity is the only one, as for almost all grids.
+		inverses: a tuple of the inverse of each of symmetries.
+	"""
+	_last = None
+
+	def __init__(self, values):
+		n = len(values)
+		self.n = n
+		self.values = values
+		self.flat_values = tuple(value for row in values for value in row)
+		self.positions = tuple(divmod(index, n) for index in range(n*n))
+		neighbors = []
+		for row, col in self.positions:
+			cells = []
+			# south, north, east and west neighbors
+			if row + 1 < n:
+				cells.append((row+1)*n + col)
+			if row - 1 >= 0:
+				cells.append((row-1)*n + col)
+			if col + 1 < n:
+				cells.append(row*n + col + 1)
+			if col - 1 >= 0:
+				cells.append(row*n + col - 1)
+			neighbors.append(tuple(cells))
+		self.neighbors = tuple(neighbors)
+		self.adjacent = tuple(tuple(self.positions[adjacent] \
+			for adjacent in cells) for cells in self.neighbors)
+		self.raid_gains = tuple(tuple((adjacent, self.flat_values[adjacent]) \
+			for adjacent in cells) for cells in self.neighbors)
+		self.keys = ZobristKeys.for_size(n)
+		self.symmetries = self.find_symmetries()
+		inverses = []
+		for permutation in self.symmetries:
+			inverse = [0] * (n*n)
+			for index, image in enumerate(permutation):
+				inverse[image] = index
+			inverses.append(tuple(inverse))
+		self.inverses = tuple(inverses)
+
+	def find_symmetries(self):
+		"""Finds the symmetry group of the values grid.
+
+		Returns:
+			The tuple of cell permutations described under symmetries.
+		"""
+		last = self.n - 1
+		transforms = [
+			lambda row, col: (row, col),
+			lambda row, col: (col, last - row),
+			lambda row, col: (last - row, last - col),
+			lambda row, col: (last - col, row),
+			lambda row, col: (row, last - col),
+			lambda row, col: (last - row, col),
+			lambda row, col: (col, row),
+			lambda row, col: (last - col, last - row),
+		]
+		symmetries = []
+		for transform in transforms:
+			permutation = tuple(image_row*self.n + image_col \
+				for image_row, image_col in \
+				(transform(row, col) for row, col in self.positions))
+			if all(self.flat_values[image] == self.flat_values[index] \
+				for index, image in enumerate(permutation)):
+				symmetries.append(permutation)
+		if len(symmetries) == 1:
+			return ()
+		return tuple(symmetries)
+
+	@classmethod
+	def for_values(cls, values):
+		"""Returns the geometry of a values grid.
+
+		The last geometry built is reused when it was built from the same
+		grid object, so boards made from one game's grid share it without
+		having to be handed it.
+		"""
+		last = cls._last
+		if last is None or last.values is not values:
+			last = cls._last = cls(values)
+		return last
+
 
 class Board:
 	"""A class representing the current game state of the board
 
 	Using Board objects, the present state of the game can be stored,
 	and additional functionality such as determining possible actions and
-	transitioning to new boards using those actions are supported
+	transitioning to new boards using those actions are supported.
+
+	A board can be changed in place with apply, which records what it did
+	on an undo stack so that undo can restore the previous position
+	exactly. Searches walk the game tree this way on a single board,
+	whereas transition leaves the board untouched and returns a new one.
+
+	Besides the cells, a board keeps its empty cells linked in index order.
+	apply and undo unlink and relink just the cell a move takes, so
+	generating the moves of a position visits its empty cells (and their
+	neighbors, for Raids) rather than all n*n cells, which pays off most
+	late in games on big boards.
 
 	Attributes:
 		n: an integer [1,26] representing the height and width of the board.
-		state: a 2D array where state[i][j] represents the state of the jth
-			cell in the ith row of the board (can either be 'X', 'O', or '.').
+		geometry: the Geometry of the game, shared by all its boards.
+		cells: a flat list of n*n chars where cells[i*n + j] represents the
+			state of the jth cell in the ith row of the board (can either be
+			'X', 'O', or '.').
+		state: a 2D array view of cells, built on each access.
 		values: a 2D of the same format as state, but each value represents
 			the value of occupying that cell.
+		flat_values: values flattened in the same order as cells.
+		keys: the ZobristKeys of the board's size.
 		turn: a character 'X' or 'O' designating which player's turn it is to
 			make a move.
 		remaining_spaces: an integer representing the number of available
@@ -115,16 +616,40 @@ class Board:
 			recalculating each time the terminal test is called.
 		scores: a dict mapping a player ('X' or 'O') to their current score.
 			Passed into the board object to save recalculation time.
+		zobrist: an integer Zobrist hash of the cell ownership and turn.
+			Passed into the board object so that transitions can update it
+			incrementally instead of rehashing the whole board. If the
+			values grid has symmetries, it is instead the smallest hash of
+			the position's symmetric views, so that equivalent positions
+			share cache entries; see canonical_move.
+		views: None if the values grid has no symmetries, else a tuple
+			(hashes, orientation) of the list of the hash of the position
+			under each of the geometry's symmetries and the index of the
+			symmetry giving zobrist.
+		next_empty, prev_empty: lists linking the empty cells into a
+			circular list in index order. Entry n*n of each is the head of
+			the list, and the entries of a cell are its successor and
+			predecessor. Entries of occupied cells are left as they were
+			when the cell was taken, so undo can relink it in place.
+		undo_stack: a list with one (index, captured, gain, loss, zobrist,
+			views) record per applied action that has not been undone yet.
 	"""
+	__slots__ = ('n', 'geometry', 'cells', 'turn', 'opponent', \
+		'remaining_spaces', 'scores', 'zobrist', 'views', 'next_empty', \
+		'prev_empty', 'undo_stack')
+
 	def __init__(self, n, state, values, turn, \
-		remaining_spaces=None, scores={'X':0, 'O':0}):
+		remaining_spaces=None, scores=None, zobrist=None, geometry=None):
 		"""Inits a Board with the given game state, board values, and
 		current player's turn. If not specified, board assumes new game
-		board with n^2 remaining spaces and scores of 0.
+		board with n^2 remaining spaces and scores of 0, and looks up the
+		geometry of values.
 		"""
 		self.n = n
-		self.state = state
-		self.values = values
+		if geometry is None:
+			geometry = Geometry.for_values(values)
+		self.geometry = geometry
+		self.cells = [owner for row in state for owner in row]
 		self.turn = turn
 		if turn == 'X':
 			self.opponent = 'O'
@@ -134,8 +659,170 @@ class Board:
 			self.remaining_spaces = remaining_spaces
 		else:
 			self.remaining_spaces = n**2
+		if scores is None:
+			scores = {'X':0, 'O':0}
 		self.scores = scores
+		if zobrist is None:
+			zobrist = geometry.keys.hash(self.cells, turn)
+		self.zobrist = zobrist
+		self.views = None
+		if geometry.symmetries:
+			self.views = self.hash_views()
+			self.zobrist = self.views[0][self.views[1]]
+		self.link_cells()
+		self.undo_stack = []
+
+	def link_cells(self):
+		"""Builds next_empty and prev_empty from the cells."""
+		cells = self.cells
+		head = len(cells)
+		empty = [index for index in range(head) if cells[index] == '.']
+		self.next_empty = [head] * (head + 1)
+		self.prev_empty = [head] * (head + 1)
+		last = head
+		for index in empty:
+			self.next_empty[last] = index
+			self.prev_empty[index] = last
+			last = index
+		self.next_empty[last] = head
+		self.prev_empty[head] = last
+
+	@property
+	def state(self):
+		n = self.n
+		return [self.cells[row*n:(row+1)*n] for row in range(n)]
+
+	def hash_views(self):
+		"""Computes views from scratch (see the class attributes)."""
+		keys = self.geometry.keys
+		hashes = []
+		for permutation in self.geometry.symmetries:
+			h = 0
+			for index, owner in enumerate(self.cells):
+				if owner != '.':
+					h ^= keys.cells[owner][permutation[index]]
+			if self.turn == 'O':
+				h ^= keys.turn
+			hashes.append(h)
+		return hashes, hashes.index(min(hashes))
+
+	def canonical_move(self, move):
+		"""Maps a move code on this board to the symmetric view that
+		zobrist hashes, the form in which caches keyed by zobrist store
+		moves.
+		"""
+		if self.views is None or not self.views[1] or move is None:
+			return move
+		image = self.geometry.symmetries[self.views[1]][move >> 1]
+		return image*2 + (move & 1)
+
+	def oriented_move(self, move):
+		"""Maps a move given by canonical_move back onto this board."""
+		if self.views is None or not self.views[1] or move is None:
+			return move
+		index = self.geometry.inverses[self.views[1]][move >> 1]
+		return index*2 + (move & 1)
+
+	def unique_moves(self):
+		"""Lists the moves of the position, leaving out every move that a
+		symmetry of the position maps onto an earlier one.
+
+		Equivalent moves have the same value, so a search of a root
+		position only has to consider the first of them, the one that
+		would win the Stake-before-Raid tie-break.
 
+		Returns:
+			A list of move codes in the order of generate_moves.
+		"""
+		moves = [0] * (2*self.n*self.n)
+		del moves[self.generate_moves(moves):]
+		if self.views is None:
+			return moves
+		cells = self.cells
+		stabilizer = [permutation for permutation in \
+			self.geometry.symmetries[1:] if all(cells[image] == cells[index] \
+			for index, image in enumerate(permutation))]
+		seen = set()
+		unique = []
+		for move in moves:
+			if move in seen:
+				continue
+			index = move >> 1
+			for permutation in stabilizer:
+				seen.add(permutation[index]*2 + (move & 1))
+			unique.append(move)
+		return unique
+
+	def unique_actions(self):
+		"""Generates the Actions of unique_moves."""
+		for move in self.unique_moves():
+			yield self.action(move)
+
+	def action(self, move):
+		"""Returns the Action of a move code for the player to move."""
+		return Action.decode(move, self.n, self.turn)
+
+	@property
+	def values(self):
+		return self.geometry.values
+
+	@property
+	def flat_values(self):
+		return self.geometry.flat_values
+
+	@property
+	def keys(self):
+		return self.geometry.keys
+
+	def copy(self):
+		"""Returns an independent Board of the same position.
+
+		The copy shares the immutable geometry but has its own cells,
+		scores and empty cell links, and an empty undo stack.
+		"""
+		board = Board.__new__(Board)
+		board.n = self.n
+		board.geometry = self.geometry
+		board.cells = self.cells[:]
+		board.turn = self.turn
+		board.opponent = self.opponent
+		board.remaining_spaces = self.remaining_spaces
+		board.scores = {'X': self.scores['X'], 'O': self.scores['O']}
+		board.zobrist = self.zobrist
+		board.views = self.views
+		board.next_empty = self.next_empty[:]
+		board.prev_empty = self.prev_empty[:]
+		board.undo_stack = []
+		return board
+
+	def encode(self):
+		"""Packs the position into a small picklable tuple.
+
+		The values grid is left out, since it stays the same for a whole
+		game and can be sent to another process once.
+
+		Returns:
+			A tuple (n, cells, turn, remaining_spaces, X score, O score,
+			zobrist) where cells is a string of the flat cell list.
+		"""
+		return (self.n, ''.join(self.cells), self.turn, \
+			self.remaining_spaces, self.scores['X'], self.scores['O'], \
+			self.zobrist)
+
+	@classmethod
+	def decode(cls, code, values, geometry=None):
+		"""Rebuilds a board packed by encode.
+
+		Args:
+			code: A tuple returned by encode.
+			values: The 2D values grid of the game.
+			geometry: The Geometry of values, or None to look it up.
+		"""
+		n, cells, turn, remaining_spaces, x_score, o_score, zobrist = code
+		state = [cells[row*n:(row+1)*n] for row in range(n)]
+		return cls(n, state, values, turn, remaining_spaces=remaining_spaces, \
+			scores={'X': x_score, 'O': o_score}, zobrist=zobrist, \
+			geometry=geometry)
 
 
 	def adjacent_positions(self, row, col):
@@ -146,59 +833,210 @@ class Board:
 			col: int representing the column of the current cell.
 
 		Returns:
-			A list containing the tuples of the (row, col) of valid
-			adjacent cells of the input cell.
+			A tuple containing the tuples of the (row, col) of valid
+			adjacent cells of the input cell, south, north, east and west.
 		"""
-		positions = []
-		# south neighbor
-		if (row + 1) < self.n:
-			positions.append((row+1,col))
-		# north neighbor
-		if (row - 1) >= 0:
-			positions.append((row-1, col))
-		# east neighbor
-		if (col + 1) < self.n:
-			positions.append((row,col+1))
-		# west neighbor
-		if (col - 1) >= 0:
-			positions.append((row, col-1))
-		return positions
+		return self.geometry.adjacent[row*self.n + col]
 
 
 	def actions(self):
-		"""Generates the list of possible actions given the current board.
+		"""Generates the possible actions given the current board.
 
 		Using the turn variable within the board object, identifies all
 		possible stake and raid moves that can be made given the current
 		board. Does not assess the value of these actions or act as a
 		transition model.
 
+		Yields:
+			Action objects containing the position of the possible action,
+			the type of action (Stake or Raid), and the player taking the
+			action, which is equal to the value of the board's turn var.
+			They come in the order of generate_moves.
+		"""
+		moves = [0] * (2*self.n*self.n)
+		for index in range(self.generate_moves(moves)):
+			yield self.action(moves[index])
+
+
+	def generate_moves(self, moves):
+		"""Writes the codes of the possible moves into a move buffer.
+
+		Searches call this at every node, so it creates no objects: the
+		moves are written over the start of a list the caller owns (see
+		MoveBuffers), which must have room for two moves per empty cell.
+		Only the empty cells are visited, by following next_empty. Each
+		(cell, type) pair is produced once.
+
+		Args:
+			moves: the list to write the move codes into.
+
 		Returns:
-			A list of Action objects containing the position of the possible
-			action, the type of action (Stake or Raid), and the player taking
-			the action, which is equal to the value of the board's turn var.
-		"""
-		legal_stake_actions = []
-		legal_raid_actions = []
-		for row in range(self.n):
-			for col in range(self.n):
-				if self.state[row][col] == '.':
-					# if cell is free, Stake is possible
-					legal_stake_actions.append(Action((row, col), 'S', \
-						self.turn))
-					for adjacent in self.adjacent_positions(row, col):
-						adj_r, adj_c = adjacent
-						# if adjacent cell is owned by current player
-						# then Raid is possible
-						if self.state[adj_r][adj_c] == self.turn:
-							legal_raid_actions.append(Action((row, col), \
-								'R', self.turn))
-
-		# Combine Stake and Raid actions into one list
+			The integer number of moves written.
+		"""
+		next_empty = self.next_empty
+		head = len(next_empty) - 1
 		# Putting all Stakes before Raids is a requirement
 		# of the assignment, does not improve performance.
+		count = 0
+		index = next_empty[head]
+		while index != head:
+			# every free cell can be Staked
+			moves[count] = index*2
+			count += 1
+			index = next_empty[index]
+		cells = self.cells
+		turn = self.turn
+		neighbors = self.geometry.neighbors
+		for stake in range(count):
+			index = moves[stake] >> 1
+			for adjacent in neighbors[index]:
+				# if adjacent cell is owned by current player
+				# then Raid is possible, however many of the
+				# player's cells border it
+				if cells[adjacent] == turn:
+					moves[count] = index*2 + 1
+					count += 1
+					break
+		return count
+
+
+	def generate_captures(self, moves):
+		"""Writes the codes of the Raids that would capture at least one
+		opponent cell into a move buffer, in the order generate_moves
+		gives them.
+
+		Returns:
+			The integer number of moves written.
+		"""
+		cells = self.cells
+		turn = self.turn
+		opponent = self.opponent
+		neighbors = self.geometry.neighbors
+		next_empty = self.next_empty
+		head = len(next_empty) - 1
+		count = 0
+		index = next_empty[head]
+		while index != head:
+			mine = theirs = False
+			for adjacent in neighbors[index]:
+				owner = cells[adjacent]
+				if owner == turn:
+					mine = True
+				elif owner == opponent:
+					theirs = True
+			if mine and theirs:
+				moves[count] = index*2 + 1
+				count += 1
+			index = next_empty[index]
+		return count
+
+
+	def move_gain(self, move):
+		"""Returns how many points a move code would earn its player.
+
+		This is the value of the cell taken plus, for a Raid, the value of
+		every opponent cell it would capture.
+		"""
+		index = move >> 1
+		geometry = self.geometry
+		gain = geometry.flat_values[index]
+		if move & 1:
+			cells = self.cells
+			opponent = self.opponent
+			for adjacent, value in geometry.raid_gains[index]:
+				if cells[adjacent] == opponent:
+					gain += value
+		return gain
+
+
+	def apply(self, action):
+		"""Applies an Action to this board in place (see apply_move)."""
+		self.apply_move(action.encode(self.n))
 
-		return legal_stake_actions + legal_raid_actions
+
+	def apply_move(self, move):
+		"""Applies a move code to this board in place.
+
+		Updates ownership, scores, spaces remaining, the hash and whose turn
+		it is, and pushes a record onto the undo stack so that undo can
+		reverse the move. Assumes the move is legal.
+
+		Args:
+			move: An int move code (see Action.encode).
+		"""
+		geometry = self.geometry
+		cells = self.cells
+		turn = self.turn
+		opponent = self.opponent
+		keys = geometry.keys
+		turn_keys = keys.cells[turn]
+		opponent_keys = keys.cells[opponent]
+
+		index = move >> 1
+		cells[index] = turn
+		gain = geometry.flat_values[index]
+		loss = 0
+		zobrist = self.zobrist ^ keys.turn ^ turn_keys[index]
+		# unlink the cell from the empty cells
+		next_empty = self.next_empty
+		prev_empty = self.prev_empty
+		after = next_empty[index]
+		before = prev_empty[index]
+		next_empty[before] = after
+		prev_empty[after] = before
+		captured = []
+		if move & 1:
+			# Because this is a raid, we must check adjacent squares
+			# for opponent pieces to capture
+			for adjacent, value in geometry.raid_gains[index]:
+				if cells[adjacent] == opponent:
+					cells[adjacent] = turn
+					captured.append(adjacent)
+					gain += value
+					loss += value
+					zobrist ^= opponent_keys[adjacent] ^ turn_keys[adjacent]
+
+		self.undo_stack.append((index, captured, gain, loss, self.zobrist, \
+			self.views))
+		if self.views is not None:
+			hashes = []
+			for permutation, h in zip(geometry.symmetries, self.views[0]):
+				h ^= keys.turn ^ turn_keys[permutation[index]]
+				for adjacent in captured:
+					image = permutation[adjacent]
+					h ^= opponent_keys[image] ^ turn_keys[image]
+				hashes.append(h)
+			zobrist = min(hashes)
+			self.views = (hashes, hashes.index(zobrist))
+		self.scores[turn] += gain
+		self.scores[opponent] -= loss
+		self.remaining_spaces -= 1
+		self.turn = opponent
+		self.opponent = turn
+		self.zobrist = zobrist
+
+
+	def undo(self):
+		"""Reverses the most recent apply on this board."""
+		index, captured, gain, loss, zobrist, views = self.undo_stack.pop()
+		# the player who made the move is the one not on turn now
+		mover = self.opponent
+		victim = self.turn
+		cells = self.cells
+		cells[index] = '.'
+		# the cell's own links are untouched since it was unlinked, and
+		# every cell unlinked after it has been relinked already
+		self.next_empty[self.prev_empty[index]] = index
+		self.prev_empty[self.next_empty[index]] = index
+		for adjacent in captured:
+			cells[adjacent] = victim
+		self.scores[mover] -= gain
+		self.scores[victim] += loss
+		self.remaining_spaces += 1
+		self.turn = mover
+		self.opponent = victim
+		self.zobrist = zobrist
+		self.views = views
 
 
 	def transition(self, action):
@@ -207,7 +1045,8 @@ class Board:
 		Given an initial board and an action, applies the action to create
 		a new board. The new board will reflect the new ownership, scores,
 		spaces remaining, as well as toggling the which player has the next
-		turn. Assumes the action is legal.
+		turn. Assumes the action is legal. The original board is not
+		changed.
 
 		Args:
 			action: An Action object to be applied to the board.
@@ -215,31 +1054,10 @@ class Board:
 		Returns:
 			A Board object reflecting the changes produced by the action.
 		"""
-		new_state = deepcopy(self.state)
-		new_scores = {'X': self.scores['X'], 'O': self.scores['O']}
-
-		i, j = action.piece_position
-		new_state[i][j] = self.turn
-		new_scores[self.turn] += self.values[i][j]
-		if action.type == 'R':
-			# Because this is a raid, we must check adjacent squares
-			# for opponent pieces to capture
-			for position in self.adjacent_positions(i, j):
-				row, col = position
-				if new_state[row][col] != '.':
-					# This square belongs to opponent, so it is captured
-					if new_state[row][col] != action.player:
-						new_state[row][col] = action.player
-						new_scores[self.turn] += self.values[row][col]
-						new_scores[self.opponent] -= self.values[row][col]
-
-		return Board(self.n, \
-			new_state, \
-			self.values, \
-			self.opponent, \
-			remaining_spaces=self.remaining_spaces - 1, \
-			scores=new_scores)
-		return new_state
+		board = self.copy()
+		board.apply(action)
+		del board.undo_stack[:]
+		return board
 
 
 	def terminal(self):
@@ -248,6 +1066,924 @@ class Board:
 		"""
 		return self.remaining_spaces == 0
 
+def bit_indices(bits):
+	"""Yields the index of every set bit of an integer, lowest first."""
+	while bits:
+		low = bits & -bits
+		yield low.bit_length() - 1
+		bits ^= low
+
+
+class BitMasks:
+	"""Precomputed bitmasks for n x n BitBoards.
+
+	Bit i*n + j of a mask stands for the cell in row i and column j, the
+	same order as Board.cells.
+
+	Attributes:
+		full: a mask with every cell of the board set.
+		not_first_col: full without the cells of the first column.
+		not_last_col: full without the cells of the last column.
+		neighbors: a list holding, for each cell index, the mask of the
+			cells adjacent to it.
+	"""
+	_by_size = {}
+
+	def __init__(self, n):
+		self.n = n
+		self.full = (1 << (n*n)) - 1
+		first_col = 0
+		for row in range(n):
+			first_col |= 1 << (row*n)
+		self.not_first_col = self.full & ~first_col
+		self.not_last_col = self.full & ~(first_col << (n - 1))
+		self.neighbors = [self.spread(1 << index) for index in range(n*n)]
+
+	@classmethod
+	def for_size(cls, n):
+		"""Returns the shared masks for n x n boards, creating them once."""
+		if n not in cls._by_size:
+			cls._by_size[n] = cls(n)
+		return cls._by_size[n]
+
+	def spread(self, bits):
+		"""Returns the mask of every cell adjacent to a cell in bits."""
+		return (((bits & self.not_last_col) << 1) | \
+			((bits & self.not_first_col) >> 1) | \
+			(bits << self.n) | (bits >> self.n)) & self.full
+
+
+class BitBoard:
+	"""A Board backend that stores ownership as integer bitmasks.
+
+	Offers the same interface as Board (generate_moves, apply_move, undo,
+	actions, transition, terminal, scores, zobrist, ...) and can be used
+	anywhere a Board is.
+	Instead of scanning every cell, move generation works on whole masks:
+	Stakes are the set bits of the empty mask, Raid candidates are the
+	empty cells in the spread of the mover's mask, and the pieces a Raid
+	captures are the cell's neighbor mask ANDed with the opponent's mask.
+	A cell bordered by several of the mover's pieces gives a single Raid.
+
+	Attributes:
+		bits: a dict mapping a player ('X' or 'O') to the mask of the cells
+			that player owns.
+		masks: the shared BitMasks for boards of this size.
+		All other attributes are as in Board; cells and state are views
+		built on each access.
+	"""
+	__slots__ = ('n', 'geometry', 'masks', 'bits', 'turn', 'opponent', \
+		'remaining_spaces', 'scores', 'zobrist', 'undo_stack')
+
+	def __init__(self, n, state, values, turn, \
+		remaining_spaces=None, scores=None, zobrist=None, geometry=None):
+		self.n = n
+		if geometry is None:
+			geometry = Geometry.for_values(values)
+		self.geometry = geometry
+		self.masks = BitMasks.for_size(n)
+		self.bits = {'X': 0, 'O': 0}
+		index = 0
+		for row in state:
+			for owner in row:
+				if owner != '.':
+					self.bits[owner] |= 1 << index
+				index += 1
+		self.turn = turn
+		if turn == 'X':
+			self.opponent = 'O'
+		else:
+			self.opponent = 'X'
+		if remaining_spaces or remaining_spaces == 0:
+			self.remaining_spaces = remaining_spaces
+		else:
+			self.remaining_spaces = n**2
+		if scores is None:
+			scores = {'X':0, 'O':0}
+		self.scores = scores
+		if zobrist is None:
+			zobrist = geometry.keys.hash(self.cells, turn)
+		self.zobrist = zobrist
+		self.undo_stack = []
+
+	values = Board.values
+	flat_values = Board.flat_values
+	keys = Board.keys
+
+	@property
+	def cells(self):
+		cells = ['.'] * (self.n * self.n)
+		for player in ('X', 'O'):
+			for index in bit_indices(self.bits[player]):
+				cells[index] = player
+		return cells
+
+	@property
+	def state(self):
+		n = self.n
+		cells = self.cells
+		return [cells[row*n:(row+1)*n] for row in range(n)]
+
+	def empty(self):
+		"""Returns the mask of the cells nobody owns."""
+		return self.masks.full & ~(self.bits['X'] | self.bits['O'])
+
+	def copy(self):
+		"""Returns an independent BitBoard of the same position."""
+		board = BitBoard.__new__(BitBoard)
+		board.n = self.n
+		board.geometry = self.geometry
+		board.masks = self.masks
+		board.bits = {'X': self.bits['X'], 'O': self.bits['O']}
+		board.turn = self.turn
+		board.opponent = self.opponent
+		board.remaining_spaces = self.remaining_spaces
+		board.scores = {'X': self.scores['X'], 'O': self.scores['O']}
+		board.zobrist = self.zobrist
+		board.undo_stack = []
+		return board
+
+	def encode(self):
+		"""Packs the position into a small picklable tuple (see Board.encode)."""
+		return Board.encode(self)
+
+	def canonical_move(self, move):
+		"""Returns move; BitBoards always hash the position as it is."""
+		return move
+
+	oriented_move = canonical_move
+
+	def unique_moves(self):
+		"""Lists the moves of the position (see Board.unique_moves);
+		BitBoards do not collapse symmetric moves.
+		"""
+		moves = [0] * (2*self.n*self.n)
+		del moves[self.generate_moves(moves):]
+		return moves
+
+	actions = Board.actions
+	unique_actions = Board.unique_actions
+	action = Board.action
+	apply = Board.apply
+
+	@classmethod
+	def decode(cls, code, values, geometry=None):
+		"""Rebuilds a board packed by encode."""
+		return Board.decode.__func__(cls, code, values, geometry)
+
+	def adjacent_positions(self, row, col):
+		"""Returns the (row, col) tuples of the neighbors of a cell."""
+		return self.geometry.adjacent[row*self.n + col]
+
+	def generate_moves(self, moves):
+		"""Writes the codes of the possible moves into a move buffer: all
+		Stakes in row-major order followed by all Raids in row-major order
+		(see Board.generate_moves).
+
+		Returns:
+			The integer number of moves written.
+		"""
+		empty = self.empty()
+		count = 0
+		for index in bit_indices(empty):
+			moves[count] = index*2
+			count += 1
+		for index in bit_indices(self.masks.spread(self.bits[self.turn]) & \
+			empty):
+			moves[count] = index*2 + 1
+			count += 1
+		return count
+
+	def generate_captures(self, moves):
+		"""Writes the codes of the capturing Raids into a move buffer (see
+		Board.generate_captures).
+		"""
+		spread = self.masks.spread
+		raids = spread(self.bits[self.turn]) & \
+			spread(self.bits[self.opponent]) & self.empty()
+		count = 0
+		for index in bit_indices(raids):
+			moves[count] = index*2 + 1
+			count += 1
+		return count
+
+	def move_gain(self, move):
+		"""Returns how many points a move code would earn its player."""
+		index = move >> 1
+		flat_values = self.geometry.flat_values
+		gain = flat_values[index]
+		if move & 1:
+			captured = self.masks.neighbors[index] & self.bits[self.opponent]
+			for adjacent in bit_indices(captured):
+				gain += flat_values[adjacent]
+		return gain
+
+	def apply_move(self, move):
+		"""Applies a move code to this board in place (see
+		Board.apply_move).
+		"""
+		turn = self.turn
+		opponent = self.opponent
+		flat_values = self.geometry.flat_values
+		keys = self.geometry.keys
+		turn_keys = keys.cells[turn]
+		opponent_keys = keys.cells[opponent]
+
+		index = move >> 1
+		placed = 1 << index
+		gain = flat_values[index]
+		loss = 0
+		zobrist = self.zobrist ^ keys.turn ^ turn_keys[index]
+		captured = 0
+		if move & 1:
+			captured = self.masks.neighbors[index] & self.bits[opponent]
+			for adjacent in bit_indices(captured):
+				gain += flat_values[adjacent]
+				loss += flat_values[adjacent]
+				zobrist ^= opponent_keys[adjacent] ^ turn_keys[adjacent]
+			self.bits[opponent] ^= captured
+
+		self.bits[turn] |= placed | captured
+		self.undo_stack.append((placed, captured, gain, loss, self.zobrist))
+		self.scores[turn] += gain
+		self.scores[opponent] -= loss
+		self.remaining_spaces -= 1
+		self.turn = opponent
+		self.opponent = turn
+		self.zobrist = zobrist
+
+	def undo(self):
+		"""Reverses the most recent apply on this board."""
+		placed, captured, gain, loss, zobrist = self.undo_stack.pop()
+		mover = self.opponent
+		victim = self.turn
+		self.bits[mover] ^= placed | captured
+		self.bits[victim] |= captured
+		self.scores[mover] -= gain
+		self.scores[victim] += loss
+		self.remaining_spaces += 1
+		self.turn = mover
+		self.opponent = victim
+		self.zobrist = zobrist
+
+	def transition(self, action):
+		"""Returns the BitBoard resulting from an Action, leaving this one
+		unchanged.
+		"""
+		board = self.copy()
+		board.apply(action)
+		del board.undo_stack[:]
+		return board
+
+	def terminal(self):
+		"""Returns True if there are no remaining spaces on the board."""
+		return self.remaining_spaces == 0
+
+
+class MoveBuffers:
+	"""Preallocated move lists for the nodes of a search.
+
+	Every node of a search writes its moves into a buffer instead of
+	building a new list (see Board.generate_moves). Each ply fills one
+	cell, so the nodes on the path from the root to the node being searched
+	all have different numbers of empty cells, and buffers are kept by that
+	number: the buffer for r empty cells is created the first time a node
+	with r empty cells is searched, with room for its at most 2*r moves, and
+	is reused by every later node with r empty cells.
+
+	Attributes:
+		buffers: a list indexed by number of empty cells of the buffers
+			created so far, None where none is yet.
+	"""
+	def __init__(self):
+		self.buffers = []
+
+	def new_search(self, state):
+		"""Drops the buffers for more empty cells than state has, which the
+		game has moved past.
+		"""
+		del self.buffers[state.remaining_spaces + 1:]
+
+	def get(self, spaces):
+		"""Returns the buffer for nodes with the given number of empty
+		cells.
+		"""
+		buffers = self.buffers
+		if spaces >= len(buffers):
+			buffers.extend([None] * (spaces + 1 - len(buffers)))
+		moves = buffers[spaces]
+		if moves is None:
+			moves = buffers[spaces] = [0] * (2*spaces)
+		return moves
+
+
+class MoveOrderer:
+	"""Sorts a position's moves so alpha-beta search finds cutoffs early.
+
+	Alpha-beta prunes the most when the best move is searched first. The
+	orderer tries, in this order: the best move the transposition table
+	remembers for the position, the killer moves of the ply (moves that
+	recently caused a cutoff at the same depth in a sibling subtree), and
+	then every other move by the points it earns immediately (cell value,
+	plus captured values for a Raid), breaking ties with the history table
+	(how much each move code has caused cutoffs anywhere in the tree).
+
+	Killers and history are kept between searches, so the iterations of
+	an iterative-deepening search teach each other.
+
+	Attributes:
+		killers: a list, indexed by ply, of the move codes of that ply's
+			killer moves, most recent first.
+		history: a dict mapping a move code to its cutoff score.
+		killer_slots: an integer of the killers remembered per ply.
+	"""
+	def __init__(self, killer_slots=2):
+		self.killers = []
+		self.history = {}
+		self.killer_slots = killer_slots
+
+	def new_search(self):
+		"""Ages the history table so that older cutoffs count for less."""
+		for key in self.history:
+			self.history[key] //= 2
+
+	def order(self, state, moves, count, ply, hint=None):
+		"""Sorts the moves of a move buffer from most to least promising.
+
+		The sort is stable, so moves that score the same keep the order
+		they were generated in.
+
+		Args:
+			state: the Board object the moves belong to.
+			moves: a move buffer whose first count entries are the legal
+				move codes of state. They are sorted in place.
+			count: an integer of the moves in the buffer.
+			ply: an integer of how far below the root state is.
+			hint: the transposition table's best move for state, or None.
+		"""
+		ordered = moves[:count]
+		history = self.history
+		# Sorting by each key in turn, least significant first, gives
+		# the same order as sorting by the tuple of keys, but needs no
+		# tuple per move; the Python sort keeps equal moves in order even
+		# when reversed.
+		if history:
+			ordered.sort(key=lambda move: history.get(move, 0), reverse=True)
+		ordered.sort(key=state.move_gain, reverse=True)
+		front = []
+		if ply < len(self.killers):
+			front = [move for move in self.killers[ply] \
+				if move != hint and move in ordered]
+			front.sort(key=ordered.index)
+		if hint is not None and hint in ordered:
+			front.insert(0, hint)
+		for move in front:
+			ordered.remove(move)
+		moves[:count] = front + ordered
+
+	def record_cutoff(self, move, ply, depth):
+		"""Credits a move that caused a cutoff.
+
+		Args:
+			move: the move code that produced the cutoff.
+			ply: an integer of how far below the root the cutoff happened.
+			depth: an integer of the plies searched below the node, so that
+				cutoffs in bigger subtrees earn more history.
+		"""
+		while len(self.killers) <= ply:
+			self.killers.append([])
+		killers = self.killers[ply]
+		if move not in killers:
+			killers.insert(0, move)
+			del killers[self.killer_slots:]
+		self.history[move] = self.history.get(move, 0) + depth*depth
+
+
+class SearchStats:
+	"""Counters and timings collected by a player during its searches.
+
+	Assign an instance to a player's stats attribute to turn collection on;
+	it is filled in by every later call to search until it is replaced or
+	set back to None. While stats are on, the searched board is wrapped in
+	an InstrumentedBoard and the player's evaluation is timed, which slows
+	the search down somewhat; with stats off none of this happens.
+
+	Attributes:
+		nodes_per_depth: a list where entry d is the number of nodes
+			visited at depth d below the root; entry 0 counts the root
+			once per root search, so once per iteration or re-searched
+			window of an iterative deepening search.
+		cutoffs_per_depth: a list where entry d is the number of alpha-beta
+			cutoffs that happened at depth d.
+		expanded: an integer count of the nodes whose actions were
+			generated, leaving out the capture lists of quiescence
+			searches.
+		children: an integer count of the actions applied while searching,
+			including the Raids of quiescence searches.
+		quiescence_nodes: an integer count of the nodes visited by
+			quiescence searches, which nodes_per_depth leaves out, one for
+			each Raid they applied.
+		tt_probes, tt_hits: integer counts of transposition table lookups,
+			and of the lookups that found their position.
+		time: a dict mapping 'actions', 'transition' and 'evaluation' to
+			the seconds spent generating actions, applying and undoing them,
+			and evaluating leaves.
+		elapsed: a float of the seconds spent in search calls.
+		searches: an integer count of the search calls recorded.
+	"""
+	def __init__(self):
+		self.nodes_per_depth = []
+		self.cutoffs_per_depth = []
+		self.expanded = 0
+		self.children = 0
+		self.quiescence_nodes = 0
+		self.tt_probes = 0
+		self.tt_hits = 0
+		self.time = {'actions': 0.0, 'transition': 0.0, 'evaluation': 0.0}
+		self.elapsed = 0.0
+		self.searches = 0
+		self._started = None
+		self._table_counts = None
+
+	@property
+	def nodes(self):
+		return sum(self.nodes_per_depth)
+
+	@property
+	def branching_factor(self):
+		"""The average number of children searched per expanded node of
+		the main search, leaving quiescence searches out.
+		"""
+		if not self.expanded:
+			return 0.0
+		return float(self.children - self.quiescence_nodes) / self.expanded
+
+	@property
+	def nodes_per_second(self):
+		if not self.elapsed:
+			return 0.0
+		return self.nodes / self.elapsed
+
+	def visit(self, depth, count=1):
+		"""Counts nodes visited at the given depth."""
+		while len(self.nodes_per_depth) <= depth:
+			self.nodes_per_depth.append(0)
+		self.nodes_per_depth[depth] += count
+
+	def cutoff(self, depth, count=1):
+		"""Counts cutoffs at the given depth."""
+		while len(self.cutoffs_per_depth) <= depth:
+			self.cutoffs_per_depth.append(0)
+		self.cutoffs_per_depth[depth] += count
+
+	def start(self, player, state):
+		"""Begins recording a search.
+
+		Args:
+			player: the player about to search.
+			state: the Board the player is about to search on.
+
+		Returns:
+			An InstrumentedBoard wrapping state, which the player should
+			search on instead.
+		"""
+		self.searches += 1
+		table = getattr(player, 'table', None)
+		if table is not None:
+			self._table_counts = (table.probes, table.hits)
+		else:
+			self._table_counts = None
+		player.evaluation = self.timed('evaluation', player.evaluation)
+		self._started = time.time()
+		return InstrumentedBoard(state, self)
+
+	def finish(self, player):
+		"""Ends recording the search begun by start."""
+		self.elapsed += time.time() - self._started
+		# drop the timing wrapper so the class's evaluation is used again
+		del player.evaluation
+		if self._table_counts is not None:
+			probes, hits = self._table_counts
+			self.tt_probes += player.table.probes - probes
+			self.tt_hits += player.table.hits - hits
+
+	def timed(self, category, function):
+		"""Wraps a function so its run time is added to time[category]."""
+		def timed_function(*args):
+			start = time.time()
+			result = function(*args)
+			self.time[category] += time.time() - start
+			return result
+		return timed_function
+
+	def merge(self, other):
+		"""Adds the counts of another SearchStats into this one."""
+		for depth, count in enumerate(other.nodes_per_depth):
+			self.visit(depth, count)
+		for depth, count in enumerate(other.cutoffs_per_depth):
+			self.cutoff(depth, count)
+		self.expanded += other.expanded
+		self.children += other.children
+		self.quiescence_nodes += other.quiescence_nodes
+		self.tt_probes += other.tt_probes
+		self.tt_hits += other.tt_hits
+		for category in self.time:
+			self.time[category] += other.time[category]
+
+	def as_dict(self):
+		"""Returns the statistics as a JSON-serializable dict."""
+		return {
+			'searches': self.searches,
+			'nodes': self.nodes,
+			'nodes_per_depth': self.nodes_per_depth,
+			'cutoffs_per_depth': self.cutoffs_per_depth,
+			'branching_factor': self.branching_factor,
+			'quiescence_nodes': self.quiescence_nodes,
+			'tt_probes': self.tt_probes,
+			'tt_hits': self.tt_hits,
+			'time': dict(self.time),
+			'elapsed': self.elapsed,
+			'nodes_per_second': self.nodes_per_second,
+		}
+
+
+class InstrumentedBoard:
+	"""Wraps a Board to time move generation and application.
+
+	Only apply_move, undo and the move generators are intercepted; every
+	other attribute is read from the wrapped board. Because searches walk
+	the tree by applying and undoing moves on one board, wrapping the root
+	board is enough to see every node.
+
+	Attributes:
+		board: the wrapped Board (or BitBoard).
+		stats: the SearchStats receiving the measurements.
+	"""
+	def __init__(self, board, stats):
+		self.board = board
+		self.stats = stats
+
+	def __getattr__(self, name):
+		return getattr(self.board, name)
+
+	def generate_moves(self, moves):
+		start = time.time()
+		count = self.board.generate_moves(moves)
+		self.stats.time['actions'] += time.time() - start
+		self.stats.expanded += 1
+		return count
+
+	def unique_moves(self):
+		start = time.time()
+		moves = self.board.unique_moves()
+		self.stats.time['actions'] += time.time() - start
+		self.stats.expanded += 1
+		return moves
+
+	def generate_captures(self, moves):
+		start = time.time()
+		count = self.board.generate_captures(moves)
+		self.stats.time['actions'] += time.time() - start
+		return count
+
+	def apply_move(self, move):
+		start = time.time()
+		self.board.apply_move(move)
+		self.stats.time['transition'] += time.time() - start
+		self.stats.children += 1
+
+	def undo(self):
+		start = time.time()
+		self.board.undo()
+		self.stats.time['transition'] += time.time() - start
+
+
+class SearchProfiler:
+	"""A sampling profiler for the searches run by one thread.
+
+	Between start and stop a background thread wakes every interval
+	seconds and records the call stack of the profiled thread, so the
+	search itself runs unchanged: nothing is wrapped and nothing is timed
+	per call, and when no profiler is running there is no cost at all.
+	Each sample is weighted by the time since the one before it, which
+	gives the time spent in each function and in each of the CATEGORIES
+	of work (see summary). Only the profiled thread is sampled, so the
+	worker processes of ParallelAlphaBetaPlayer and MCTSPlayer are not
+	seen.
+
+	The samples can be written as collapsed stacks, one line per distinct
+	stack as read by flamegraph.pl and speedscope, or as a Chrome trace
+	(chrome://tracing, Perfetto) where consecutive samples with the same
+	frames are merged into one event per call.
+
+	Attributes:
+		interval: the float seconds between samples.
+		samples: a list of (seconds, stack) tuples in the order they were
+			taken, where seconds is the time since start and stack is a
+			tuple of the function names of the sampled frames, outermost
+			first.
+		elapsed: the float seconds between start and stop.
+	"""
+	# Functions whose samples are counted as each kind of work, matched
+	# on their names from the innermost frame out; the time of samples in
+	# none of them is counted as 'search'.
+	CATEGORIES = (
+		('actions', ('generate_moves', 'generate_captures', 'unique_moves', \
+			'unique_actions', 'actions')),
+		('transition', ('apply_move', 'undo', 'apply', 'transition', 'copy')),
+		('evaluation', ('evaluation', 'evaluate', 'evaluate_children')),
+		('cutoff_test', ('cutoff_test', 'ponder_cutoff_test', 'terminal')),
+		('ordering', ('order', 'ordered_moves', 'move_gain', 'hint_first', \
+			'record_cutoff')),
+		('table', ('probe', 'store', 'key')),
+	)
+
+	def __init__(self, interval=PROFILE_INTERVAL):
+		self.interval = interval
+		self.samples = []
+		self.elapsed = 0.0
+		self._thread = None
+		self._stopping = threading.Event()
+		self._started = None
+		self._switch_interval = None
+
+	def start(self, ident=None):
+		"""Begins sampling a thread, dropping any earlier samples.
+
+		The interpreter's thread switch interval is shortened while
+		sampling, so the sampler gets to run on time while the profiled
+		thread holds the GIL.
+
+		Args:
+			ident: the threading ident of the thread to sample, by default
+				the calling thread.
+		"""
+		self.stop()
+		if ident is None:
+			ident = threading.get_ident()
+		self.samples = []
+		self.elapsed = 0.0
+		self._stopping.clear()
+		self._switch_interval = sys.getswitchinterval()
+		sys.setswitchinterval(min(self._switch_interval, self.interval / 2))
+		self._started = time.perf_counter()
+		self._thread = threading.Thread(target=self.sample, args=(ident,))
+		self._thread.daemon = True
+		self._thread.start()
+
+	def stop(self):
+		"""Ends sampling, if it was started."""
+		if self._thread is None:
+			return
+		self._stopping.set()
+		self._thread.join()
+		self._thread = None
+		self.elapsed = time.perf_counter() - self._started
+		sys.setswitchinterval(self._switch_interval)
+
+	def sample(self, ident):
+		"""Records the stack of a thread every interval until stopped."""
+		names = {}
+		while not self._stopping.wait(self.interval):
+			frame = sys._current_frames().get(ident)
+			if frame is None:
+				break
+			stack = []
+			while frame is not None:
+				code = frame.f_code
+				name = names.get(code)
+				if name is None:
+					name = getattr(code, 'co_qualname', code.co_name)
+					names[code] = name
+				stack.append(name)
+				frame = frame.f_back
+			stack.reverse()
+			self.samples.append((time.perf_counter() - self._started, \
+				tuple(stack)))
+
+	def weighted_samples(self):
+		"""Yields (seconds, stack) pairs, where seconds is the time since
+		the previous sample.
+		"""
+		last = 0.0
+		for at, stack in self.samples:
+			yield at - last, stack
+			last = at
+
+	def category(self, stack):
+		"""Returns the CATEGORIES name of a sampled stack, or 'search'."""
+		for name in reversed(stack):
+			name = name.rsplit('.', 1)[-1]
+			for category, functions in self.CATEGORIES:
+				if name in functions:
+					return category
+		return 'search'
+
+	def summary(self):
+		"""Returns the sampled times as a JSON-serializable dict.
+
+		Returns:
+			A dict with the 'samples' count, the profiled 'elapsed' seconds,
+			'time' mapping each category to the seconds sampled in it, and
+			'functions' mapping each sampled function name to a dict of its
+			'self' seconds (sampled as the innermost frame) and 'total'
+			seconds (sampled anywhere on the stack).
+		"""
+		times = dict((category, 0.0) for category, _ in self.CATEGORIES)
+		times['search'] = 0.0
+		functions = {}
+		for seconds, stack in self.weighted_samples():
+			times[self.category(stack)] += seconds
+			for name in set(stack):
+				function = functions.setdefault(name, {'self': 0.0, \
+					'total': 0.0})
+				function['total'] += seconds
+			if stack:
+				functions[stack[-1]]['self'] += seconds
+		return {
+			'samples': len(self.samples),
+			'elapsed': self.elapsed,
+			'time': times,
+			'functions': functions,
+		}
+
+	def write_collapsed(self, stream):
+		"""Writes the samples as collapsed stacks, one 'a;b;c count' line
+		per distinct stack, where count is in microseconds.
+		"""
+		counts = {}
+		for seconds, stack in self.weighted_samples():
+			key = ';'.join(stack)
+			counts[key] = counts.get(key, 0.0) + seconds
+		for key in sorted(counts):
+			stream.write('{} {}\n'.format(key, int(round(counts[key] * 1e6))))
+
+	def write_chrome_trace(self, stream):
+		"""Writes the samples as a Chrome trace of complete ('X') events.
+
+		A frame opens at the first sample it appears in and closes at the
+		first sample without it, so every call lasting a few intervals
+		becomes one event with microsecond timestamps.
+		"""
+		import json
+		events = []
+		frames = []
+		for at, stack in self.samples + [(self.elapsed, ())]:
+			common = 0
+			while common < len(frames) and common < len(stack) and \
+				frames[common][0] == stack[common]:
+				common += 1
+			while len(frames) > common:
+				name, opened, category = frames.pop()
+				events.append({'name': name, 'cat': category, 'ph': 'X', \
+					'ts': opened * 1e6, 'dur': (at - opened) * 1e6, \
+					'pid': 0, 'tid': 0})
+			for depth in range(common, len(stack)):
+				frames.append((stack[depth], at, \
+					self.category(stack[:depth + 1])))
+		json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, stream)
+
+
+class NumpyEvaluator:
+	"""A positional evaluation computed with NumPy over whole boards.
+
+	The default evaluation, the score difference, only counts material. At
+	a depth cutoff that misses what is about to happen, so this evaluation
+	adds two terms, each taken as the difference between the two players:
+
+		raid exposure: for every empty cell next to both colors, the value
+			of the opponent cells a Raid there would capture, i.e. what
+			each player threatens to take with their next move.
+		territory: the value of the empty cells next to only one color,
+			which that player is best placed to claim.
+
+	The terms are computed for all cells at once from occupancy masks, a
+	flat values array and a neighbor index table, and evaluate_children
+	scores every child of a node in a single batch of array operations.
+	Results are rounded to integers, as PVSPlayer's null windows expect.
+
+	Requires NumPy, which is otherwise not needed by this module.
+
+	Attributes:
+		threat_weight: a float weight of the raid exposure term.
+		territory_weight: a float weight of the territory term.
+	"""
+	def __init__(self, threat_weight=THREAT_WEIGHT, \
+		territory_weight=TERRITORY_WEIGHT):
+		if np is None:
+			raise ImportError('NumpyEvaluator requires numpy')
+		self.threat_weight = threat_weight
+		self.territory_weight = territory_weight
+		self._values_grid = None
+
+	def prepare(self, state):
+		"""Builds the value and neighbor arrays for the game of a state.
+
+		The arrays are rebuilt only when a board of another game is seen.
+		Neighbor entries past a board edge point at an extra padding cell
+		n*n, which is always empty and worth nothing.
+		"""
+		if self._values_grid is state.values:
+			return
+		n = state.n
+		size = n*n
+		self._values_grid = state.values
+		self.values = np.zeros(size + 1)
+		self.values[:size] = state.flat_values
+		self.neighbors = np.full((size, 4), size, dtype=np.intp)
+		for index, cells in enumerate(state.geometry.neighbors):
+			self.neighbors[index, :len(cells)] = cells
+
+	def masks(self, state):
+		"""Returns the (X, O) occupancy masks of a state, padded by one cell."""
+		cells = np.array(state.cells + ['.'])
+		return cells == 'X', cells == 'O'
+
+	def score(self, mine, theirs):
+		"""Evaluates a batch of positions.
+
+		Args:
+			mine, theirs: boolean arrays of shape (batch, n*n + 1) of the
+				cells owned by the player the evaluation is for and by the
+				opponent. The padding cell must be unowned.
+
+		Returns:
+			An integer array of shape (batch,) of evaluations.
+		"""
+		values = self.values
+		neighbors = self.neighbors
+		size = len(values) - 1
+		empty = ~(mine | theirs)[:, :size]
+		# per cell, is it next to a piece of each player, and the value of
+		# the pieces of each player next to it
+		near_mine = mine[:, neighbors].any(axis=2)
+		near_theirs = theirs[:, neighbors].any(axis=2)
+		mine_around = (mine * values)[:, neighbors].sum(axis=2)
+		theirs_around = (theirs * values)[:, neighbors].sum(axis=2)
+
+		material = (mine * values).sum(axis=1) - (theirs * values).sum(axis=1)
+		contested = empty & near_mine & near_theirs
+		threat = (contested * (theirs_around - mine_around)).sum(axis=1)
+		cell_values = values[:size]
+		territory = ((empty & near_mine & ~near_theirs) * cell_values).sum( \
+			axis=1) - ((empty & near_theirs & ~near_mine) * cell_values).sum( \
+			axis=1)
+		total = material + self.threat_weight * threat + \
+			self.territory_weight * territory
+		return np.rint(total).astype(int)
+
+	def evaluate(self, state, player):
+		"""Evaluates one state for the given player ('X' or 'O')."""
+		self.prepare(state)
+		x, o = self.masks(state)
+		if player == 'X':
+			mine, theirs = x, o
+		else:
+			mine, theirs = o, x
+		return int(self.score(mine[None], theirs[None])[0])
+
+	def evaluate_children(self, state, moves, player):
+		"""Evaluates the states reached by each of a list of moves.
+
+		The children are built directly as arrays from the parent's masks,
+		without applying the moves to the board.
+
+		Args:
+			state: the Board the moves are legal in.
+			moves: a list of move codes.
+			player: the player ('X' or 'O') the evaluations are for.
+
+		Returns:
+			A list of the integer evaluation of each child, in the order of
+			moves.
+		"""
+		self.prepare(state)
+		x, o = self.masks(state)
+		if state.turn == 'X':
+			mover, victim = x, o
+		else:
+			mover, victim = o, x
+		count = len(moves)
+		movers = np.repeat(mover[None], count, axis=0)
+		victims = np.repeat(victim[None], count, axis=0)
+		codes = np.array(moves, dtype=np.intp)
+		cells = codes >> 1
+		raids = (codes & 1).astype(bool)
+		rows = np.arange(count)
+		movers[rows, cells] = True
+		# a Raid captures every opponent piece next to its cell
+		captured = victims[rows[:, None], self.neighbors[cells]] & raids[:, None]
+		capture_rows = np.repeat(rows, 4).reshape(count, 4)[captured]
+		capture_cells = self.neighbors[cells][captured]
+		movers[capture_rows, capture_cells] = True
+		victims[capture_rows, capture_cells] = False
+		if player == state.turn:
+			scores = self.score(movers, victims)
+		else:
+			scores = self.score(victims, movers)
+		return scores.tolist()
+
+
 class MinimaxPlayer:
 	"""A game-playing AI implementing the vanilla Minimax algorithm.
 
@@ -259,11 +1995,25 @@ class MinimaxPlayer:
 		opponent: A char that is whichever char my_player is not.
 		max_depth: An integer representing the maximum depth in the
 			minimax search tree this bot can observe before cutting-off.
+		table: A TranspositionTable caching values of positions already
+			searched, or None if caching is disabled.
+		evaluator: A NumpyEvaluator scoring the leaves of the game tree, or
+			None to score them by the score difference.
+		buffers: The MoveBuffers the nodes of a search write their moves
+			into.
+		nodes: An integer count of the nodes visited by the last search.
+		stats: A SearchStats filled in by every search, or None.
 	"""
-	def __init__(self, my_player, opponent, max_depth):
+	def __init__(self, my_player, opponent, max_depth, tt_size=TT_SIZE, \
+		evaluator=None):
 		self.my_player = my_player
 		self.opponent = opponent
 		self.max_depth = max_depth
+		self.table = TranspositionTable(tt_size) if tt_size else None
+		self.evaluator = evaluator
+		self.buffers = MoveBuffers()
+		self.nodes = 0
+		self.stats = None
 
 	def cutoff_test(self, state, curr_depth):
 		"""Determines if the bot should stop searching the game tree.
@@ -278,6 +2028,9 @@ class MinimaxPlayer:
 			True if the search has reached the maximum depth or if the
 			board is in a terminal state. False if neither is true.
 		"""
+		self.nodes += 1
+		if self.stats is not None:
+			self.stats.visit(curr_depth)
 		if curr_depth >= self.max_depth:
 			return True
 		elif state.terminal():
@@ -293,8 +2046,11 @@ class MinimaxPlayer:
 				being explored.
 
 		Returns:
-			The bot's player score - its opponent's player score.
+			The bot's player score - its opponent's player score, or the
+			evaluator's value of the state if the bot has one.
 		"""
+		if self.evaluator is not None:
+			return self.evaluator.evaluate(state, self.my_player)
 		return state.scores[self.my_player] - state.scores[self.opponent]
 
 	def max_value(self, state, curr_depth):
@@ -315,9 +2071,25 @@ class MinimaxPlayer:
 		"""
 		if self.cutoff_test(state, curr_depth):
 			return self.evaluation(state)
+		depth = self.max_depth - curr_depth
+		if self.table is not None:
+			entry = self.table.probe(state.zobrist)
+			if entry is not None and entry[1] >= depth:
+				return entry[2]
 		v = float('-Inf')
-		for action in state.actions():
-			v = max(v, self.min_value(state.transition(action), curr_depth+1))
+		best_move = None
+		moves = self.buffers.get(state.remaining_spaces)
+		for index in range(state.generate_moves(moves)):
+			move = moves[index]
+			state.apply_move(move)
+			child_v = self.min_value(state, curr_depth+1)
+			state.undo()
+			if child_v > v:
+				v = child_v
+				best_move = move
+		if self.table is not None:
+			self.table.store(state.zobrist, depth, v, \
+				TranspositionTable.EXACT, state.canonical_move(best_move))
 		return v
 
 	def min_value(self, state, curr_depth):
@@ -338,9 +2110,25 @@ class MinimaxPlayer:
 		"""
 		if self.cutoff_test(state, curr_depth):
 			return self.evaluation(state)
+		depth = self.max_depth - curr_depth
+		if self.table is not None:
+			entry = self.table.probe(state.zobrist)
+			if entry is not None and entry[1] >= depth:
+				return entry[2]
 		v = float('Inf')
-		for action in state.actions():
-			v = min(v, self.max_value(state.transition(action), curr_depth+1))
+		best_move = None
+		moves = self.buffers.get(state.remaining_spaces)
+		for index in range(state.generate_moves(moves)):
+			move = moves[index]
+			state.apply_move(move)
+			child_v = self.max_value(state, curr_depth+1)
+			state.undo()
+			if child_v < v:
+				v = child_v
+				best_move = move
+		if self.table is not None:
+			self.table.store(state.zobrist, depth, v, \
+				TranspositionTable.EXACT, state.canonical_move(best_move))
 		return v
 
 	def search(self, state):
@@ -355,18 +2143,34 @@ class MinimaxPlayer:
 		Returns:
 			The Action object with the highest value across all actions.
 		"""
-		best_action = None
+		self.nodes = 0
+		if self.table is not None:
+			self.table.new_search()
+		# search on a private copy so the caller's board is never left
+		# half-searched, even if the search is interrupted
+		state = state.copy()
+		self.buffers.new_search(state)
+		if self.stats is not None:
+			state = self.stats.start(self, state)
+			self.stats.visit(0)
+		best_move = None
 		best_value = float('-Inf')
-		for action in state.actions():
-			v = self.min_value(state.transition(action), 1)
+		for move in state.unique_moves():
+			state.apply_move(move)
+			v = self.min_value(state, 1)
+			state.undo()
 			# Because we consider all Stake moves first it makes sense to
 			# use v > best_value, because then even if a Raid action has
 			# the same value as a Stake value, we will use the Stake value
 			# (as instructed, ties are broken using Stake)
 			if v > best_value:
 				best_value = v
-				best_action = action
-		return best_action
+				best_move = move
+		if self.stats is not None:
+			self.stats.finish(self)
+		if best_move is None:
+			return None
+		return state.action(best_move)
 
 
 class AlphaBetaPlayer:
@@ -381,11 +2185,41 @@ class AlphaBetaPlayer:
 		opponent: A char that is whichever char my_player is not.
 		max_depth: An integer representing the maximum depth in the
 			minimax search tree this bot can observe before cutting-off.
+		table: A TranspositionTable caching values of positions already
+			searched, or None if caching is disabled.
+		orderer: A MoveOrderer deciding in which order moves are
+			searched, or None to search them in the order
+			Board.generate_moves generates them.
+		evaluator: A NumpyEvaluator scoring the leaves of the game tree, or
+			None to score them by the score difference. With an evaluator,
+			all children of a node just above the depth limit are scored
+			in one batch instead of being visited one by one, unless
+			quiescence search is on.
+		quiescence_nodes: An integer limit on the nodes a quiescence search
+			may visit below each leaf, or 0 to score leaves where the depth
+			limit stops the search (see quiesce).
+		buffers: The MoveBuffers the nodes of a search write their moves
+			into. The tree is searched on move codes throughout, and only
+			the chosen move is turned into an Action.
+		nodes: An integer count of the nodes visited by the last search.
+		value: The root value the last search found for the chosen action,
+			or None if it is not known.
+		stats: A SearchStats filled in by every search, or None.
 	"""
-	def __init__(self, my_player, opponent, max_depth):
+	def __init__(self, my_player, opponent, max_depth, tt_size=TT_SIZE, \
+		orderer=None, evaluator=None, quiescence_nodes=0):
 		self.my_player = my_player
 		self.opponent = opponent
 		self.max_depth = max_depth
+		self.table = TranspositionTable(tt_size) if tt_size else None
+		self.orderer = orderer
+		self.evaluator = evaluator
+		self.quiescence_nodes = quiescence_nodes
+		self.quiescence_left = 0
+		self.buffers = MoveBuffers()
+		self.nodes = 0
+		self.value = None
+		self.stats = None
 
 	def cutoff_test(self, state, curr_depth):
 		"""Determines if the bot should stop searching the game tree.
@@ -400,12 +2234,63 @@ class AlphaBetaPlayer:
 			True if the search has reached the maximum depth or if the
 			board is in a terminal state. False if neither is true.
 		"""
+		self.nodes += 1
+		if self.stats is not None:
+			self.stats.visit(curr_depth)
 		if curr_depth >= self.max_depth:
 			return True
 		elif state.terminal():
 			return True
 		return False
 
+	def ordered_moves(self, state, curr_depth, hint):
+		"""Generates the moves of a node in the order they should be
+		searched.
+
+		Args:
+			state: A Board object of the node being expanded.
+			curr_depth: An integer of the depth of the node.
+			hint: The transposition table's best move for the node, or
+				None.
+
+		Returns:
+			A tuple (moves, count) of the node's move buffer and the number
+			of moves at its start.
+		"""
+		moves = self.buffers.get(state.remaining_spaces)
+		count = state.generate_moves(moves)
+		if self.orderer is None:
+			hint_first(moves, count, hint)
+		else:
+			self.orderer.order(state, moves, count, curr_depth, hint)
+		return moves, count
+
+	def frontier_values(self, state, curr_depth):
+		"""Scores every child of a node whose children are all leaves.
+
+		The children are evaluated by one evaluator batch and counted as
+		visited nodes, as if each had been searched.
+
+		Args:
+			state: A Board object of a node one ply above the depth limit.
+			curr_depth: An integer of the depth of the node.
+
+		Returns:
+			A tuple (moves, values) of the list of move codes of the node in
+			generation order and the list of the values of their children.
+		"""
+		moves = self.buffers.get(state.remaining_spaces)
+		moves = moves[:state.generate_moves(moves)]
+		start = time.time()
+		values = self.evaluator.evaluate_children(state, moves, \
+			self.my_player)
+		self.nodes += len(moves)
+		if self.stats is not None:
+			self.stats.time['evaluation'] += time.time() - start
+			self.stats.visit(curr_depth + 1, len(moves))
+			self.stats.children += len(moves)
+		return moves, values
+
 	def evaluation(self, state):
 		"""Evaluates the current state of the board by computing the game
 			score.
@@ -415,10 +2300,89 @@ class AlphaBetaPlayer:
 				being explored.
 
 		Returns:
-			The bot's player score - its opponent's player score.
+			The bot's player score - its opponent's player score, or the
+			evaluator's value of the state if the bot has one.
 		"""
+		if self.evaluator is not None:
+			return self.evaluator.evaluate(state, self.my_player)
 		return state.scores[self.my_player] - state.scores[self.opponent]
 
+	def leaf_value(self, state, alpha, beta):
+		"""Scores a node the search stops at.
+
+		Args:
+			state: A Board object of a node at the depth limit or at the
+				end of the game.
+			alpha, beta: The window the node is searched with.
+
+		Returns:
+			The evaluation of the node, or its quiescence search value if
+			quiescence is turned on and the game is not over.
+		"""
+		if not self.quiescence_nodes or state.terminal():
+			return self.evaluation(state)
+		self.quiescence_left = self.quiescence_nodes
+		return self.quiesce(state, alpha, beta)
+
+	def quiesce(self, state, alpha, beta):
+		"""Searches only the capturing Raids below a leaf.
+
+		A leaf in the middle of a Raid exchange is misjudged by its
+		evaluation, since the next Raid may take back what the last one
+		took. Quiescence search keeps playing Raids that capture at least
+		one cell, biggest gain first, until none are left. The player to
+		move may instead stop the exchange and take the evaluation (stand
+		pat), which bounds the value on their side: playing a Stake
+		instead never loses points. The search gives up, keeping the best
+		value found, once quiescence_left runs out.
+
+		Args:
+			state: A Board object of the node being searched.
+			alpha, beta: The window of values of interest, from the point
+				of view of my_player like the rest of the search.
+
+		Returns:
+			The value of the node for my_player, exact if it lies strictly
+			between alpha and beta, otherwise a bound on that side.
+		"""
+		v = self.evaluation(state)
+		if state.terminal() or self.quiescence_left <= 0:
+			return v
+		maximizing = state.turn == self.my_player
+		if maximizing:
+			if v >= beta:
+				return v
+			alpha = max(alpha, v)
+		else:
+			if v <= alpha:
+				return v
+			beta = min(beta, v)
+		moves = self.buffers.get(state.remaining_spaces)
+		count = state.generate_captures(moves)
+		moves[:count] = sorted(moves[:count], key=state.move_gain, \
+			reverse=True)
+		for index in range(count):
+			if self.quiescence_left <= 0:
+				break
+			self.quiescence_left -= 1
+			self.nodes += 1
+			if self.stats is not None:
+				self.stats.quiescence_nodes += 1
+			state.apply_move(moves[index])
+			child_v = self.quiesce(state, alpha, beta)
+			state.undo()
+			if maximizing:
+				v = max(v, child_v)
+				if v >= beta:
+					break
+				alpha = max(alpha, v)
+			else:
+				v = min(v, child_v)
+				if v <= alpha:
+					break
+				beta = min(beta, v)
+		return v
+
 	def max_value(self, state, alpha, beta, curr_depth):
 		"""Performs search on MAX nodes in the game tree.
 		
@@ -440,13 +2404,49 @@ class AlphaBetaPlayer:
 			the current state.
 		"""
 		if self.cutoff_test(state, curr_depth):
-			return self.evaluation(state)
+			return self.leaf_value(state, alpha, beta)
+		depth = self.max_depth - curr_depth
+		hint = None
+		if self.table is not None:
+			entry = self.table.probe(state.zobrist)
+			if entry is not None:
+				hint = state.oriented_move(entry[4])
+				if entry[1] >= depth:
+					if entry[3] == TranspositionTable.EXACT:
+						return entry[2]
+					elif entry[3] == TranspositionTable.LOWER:
+						alpha = max(alpha, entry[2])
+					else:
+						beta = min(beta, entry[2])
+					if alpha >= beta:
+						return entry[2]
+		if depth == 1 and self.evaluator is not None and \
+			not self.quiescence_nodes:
+			moves, values = self.frontier_values(state, curr_depth)
+			v = max(values)
+			self.store(state, depth, v, float('-Inf'), float('Inf'), \
+				moves[values.index(v)])
+			return v
+		alpha_orig = alpha
 		v = float('-Inf')
-		for action in state.actions():
-			v = max(v, self.min_value(state.transition(action), alpha, beta, curr_depth+1))
+		best_move = None
+		moves, count = self.ordered_moves(state, curr_depth, hint)
+		for index in range(count):
+			move = moves[index]
+			state.apply_move(move)
+			child_v = self.min_value(state, alpha, beta, curr_depth+1)
+			state.undo()
+			if child_v > v:
+				v = child_v
+				best_move = move
 			if v >= beta:
-				return v
+				if self.orderer is not None:
+					self.orderer.record_cutoff(move, curr_depth, depth)
+				if self.stats is not None:
+					self.stats.cutoff(curr_depth)
+				break
 			alpha = max(alpha, v)
+		self.store(state, depth, v, alpha_orig, beta, best_move)
 		return v
 
 	def min_value(self, state, alpha, beta, curr_depth):
@@ -470,15 +2470,157 @@ class AlphaBetaPlayer:
 			the current state.
 		"""
 		if self.cutoff_test(state, curr_depth):
-			return self.evaluation(state)
+			return self.leaf_value(state, alpha, beta)
+		depth = self.max_depth - curr_depth
+		hint = None
+		if self.table is not None:
+			entry = self.table.probe(state.zobrist)
+			if entry is not None:
+				hint = state.oriented_move(entry[4])
+				if entry[1] >= depth:
+					if entry[3] == TranspositionTable.EXACT:
+						return entry[2]
+					elif entry[3] == TranspositionTable.LOWER:
+						alpha = max(alpha, entry[2])
+					else:
+						beta = min(beta, entry[2])
+					if alpha >= beta:
+						return entry[2]
+		if depth == 1 and self.evaluator is not None and \
+			not self.quiescence_nodes:
+			moves, values = self.frontier_values(state, curr_depth)
+			v = min(values)
+			self.store(state, depth, v, float('-Inf'), float('Inf'), \
+				moves[values.index(v)])
+			return v
+		beta_orig = beta
 		v = float('Inf')
-		for action in state.actions():
-			v = min(v, self.max_value(state.transition(action), alpha, beta, curr_depth+1))
+		best_move = None
+		moves, count = self.ordered_moves(state, curr_depth, hint)
+		for index in range(count):
+			move = moves[index]
+			state.apply_move(move)
+			child_v = self.max_value(state, alpha, beta, curr_depth+1)
+			state.undo()
+			if child_v < v:
+				v = child_v
+				best_move = move
 			if v <= alpha:
-				return v
+				if self.orderer is not None:
+					self.orderer.record_cutoff(move, curr_depth, depth)
+				if self.stats is not None:
+					self.stats.cutoff(curr_depth)
+				break
 			beta = min(beta, v)
+		self.store(state, depth, v, alpha, beta_orig, best_move)
 		return v
 
+	def store(self, state, depth, v, alpha, beta, best_move):
+		"""Records a node's backed-up value in the transposition table.
+
+		Args:
+			state: A Board object of the node that was searched.
+			depth: An integer of the plies searched below the node.
+			v: The value the search of the node returned.
+			alpha, beta: The window the node was searched with.
+			best_move: The move code that produced v.
+		"""
+		if self.table is None:
+			return
+		if v <= alpha:
+			flag = TranspositionTable.UPPER
+		elif v >= beta:
+			flag = TranspositionTable.LOWER
+		else:
+			flag = TranspositionTable.EXACT
+		self.table.store(state.zobrist, depth, v, flag, \
+			state.canonical_move(best_move))
+
+	def root_moves(self, state):
+		"""Lists the root moves in search order along with their ranks.
+
+		Of moves that a symmetry of the position makes equivalent, only
+		the first is listed (see Board.unique_moves). The rank of a move
+		is its position in the order they are generated, which is the
+		order ties are broken in (Stakes before Raids).
+
+		Args:
+			state: A Board object representing the root of the game tree.
+
+		Returns:
+			A tuple of the list of root move codes, ordered for searching,
+			and a dict mapping each move to its rank.
+		"""
+		moves = state.unique_moves()
+		rank = {}
+		for index, move in enumerate(moves):
+			rank[move] = index
+		hint = None
+		if self.table is not None:
+			entry = self.table.probe(state.zobrist)
+			if entry is not None:
+				hint = state.oriented_move(entry[4])
+		# the hint may be the twin of a move that was left out
+		if hint not in rank:
+			hint = None
+		if self.orderer is not None:
+			self.orderer.order(state, moves, len(moves), 0, hint)
+		else:
+			hint_first(moves, len(moves), hint)
+		return moves, rank
+
+	def search_window(self, state, alpha, beta):
+		"""Searches the root of the game tree within an (alpha, beta) window.
+
+		Root actions may be searched in any order, and each one after the
+		first is only searched far enough to tell whether it beats the best
+		value so far. Ties still go to the action generated first by
+		Board.generate_moves (i.e. Stakes before Raids): an earlier action
+		whose bounded search comes back exactly equal to the best value is
+		searched again to find out whether it really ties.
+
+		Args:
+			state: A Board object representing the root of the game tree.
+				It is changed during the search and restored afterwards.
+			alpha, beta: The window of root values of interest.
+
+		Returns:
+			A tuple (value, action). If alpha < value < beta, value is the
+			exact minimax value and action the best Action. If value <= alpha
+			the search failed low and value is only an upper bound; if
+			value >= beta it failed high and value is only a lower bound.
+		"""
+		if self.stats is not None:
+			self.stats.visit(0)
+		moves, rank = self.root_moves(state)
+		best_move = None
+		best_rank = None
+		best_value = float('-Inf')
+		for move in moves:
+			move_rank = rank[move]
+			state.apply_move(move)
+			v = self.min_value(state, max(alpha, best_value), beta, 1)
+			if v == best_value and best_value > alpha and \
+				move_rank < best_rank:
+				# v may only be an upper bound; check for a real tie
+				v = min(best_value, \
+					self.min_value(state, float('-Inf'), best_value, 1))
+			state.undo()
+			# ties are broken using Stake, i.e. the lower rank
+			if v > best_value or (v == best_value and \
+				(best_move is None or move_rank < best_rank)):
+				best_value = v
+				best_move = move
+				best_rank = move_rank
+			if best_value >= beta:
+				break
+		if self.table is not None and alpha < best_value < beta:
+			self.table.store(state.zobrist, self.max_depth, best_value, \
+				TranspositionTable.EXACT, state.canonical_move(best_move))
+		if best_move is None:
+			return best_value, None
+		return best_value, state.action(best_move)
+
 	def search(self, state):
 		"""Determines the best possible move given the current game board.
 
@@ -491,20 +2633,1164 @@ class AlphaBetaPlayer:
 		Returns:
 			The Action object with the highest value across all actions.
 		"""
-		best_action = None
+		self.nodes = 0
+		if self.table is not None:
+			self.table.new_search()
+		if self.orderer is not None:
+			self.orderer.new_search()
+		# search on a private copy so the caller's board is never left
+		# half-searched, even if the search is interrupted
+		state = state.copy()
+		self.buffers.new_search(state)
+		if self.stats is not None:
+			state = self.stats.start(self, state)
+		self.value, action = self.search_window(state, float('-Inf'), \
+			float('Inf'))
+		if self.stats is not None:
+			self.stats.finish(self)
+		return action
+
+
+class PVSPlayer(AlphaBetaPlayer):
+	"""A game-playing AI implementing principal variation search.
+
+	PVS is alpha-beta search written in negamax form: every node is scored
+	from the point of view of the player to move, so one function serves
+	both MAX and MIN nodes. The first action of a node is searched with the
+	full window. Every later action is only tested with a null window to
+	prove that it is no better than the best so far, and is searched again
+	with the full window only when that test fails high. With good move
+	ordering the first action is usually best, so most of the tree is
+	searched with cheap null windows.
+
+	Null windows assume evaluations are integers, which the score
+	difference always is.
+
+	Attributes:
+		As in AlphaBetaPlayer. Transposition table values are stored from
+		the point of view of the player to move.
+	"""
+	def negamax(self, state, alpha, beta, curr_depth):
+		"""Performs principal variation search on a node of the game tree.
+
+		Args:
+			state: A Board object representing the node being searched.
+			alpha: The value the player to move is already guaranteed.
+			beta: The value above which the opponent will avoid this node.
+			curr_depth: An integer of the current depth the search is
+				exploring in the game tree.
+
+		Returns:
+			The value of the node for the player to move, exact if it lies
+			strictly between alpha and beta, otherwise a bound on that side.
+		"""
+		if self.cutoff_test(state, curr_depth):
+			if state.turn == self.my_player:
+				return self.leaf_value(state, alpha, beta)
+			return -self.leaf_value(state, -beta, -alpha)
+		depth = self.max_depth - curr_depth
+		hint = None
+		if self.table is not None:
+			entry = self.table.probe(state.zobrist)
+			if entry is not None:
+				hint = state.oriented_move(entry[4])
+				if entry[1] >= depth:
+					if entry[3] == TranspositionTable.EXACT:
+						return entry[2]
+					elif entry[3] == TranspositionTable.LOWER:
+						alpha = max(alpha, entry[2])
+					else:
+						beta = min(beta, entry[2])
+					if alpha >= beta:
+						return entry[2]
+		if depth == 1 and self.evaluator is not None and \
+			not self.quiescence_nodes:
+			moves, values = self.frontier_values(state, curr_depth)
+			if state.turn != self.my_player:
+				values = [-value for value in values]
+			v = max(values)
+			self.store(state, depth, v, float('-Inf'), float('Inf'), \
+				moves[values.index(v)])
+			return v
+		alpha_orig = alpha
+		v = float('-Inf')
+		best_move = None
+		moves, count = self.ordered_moves(state, curr_depth, hint)
+		for index in range(count):
+			move = moves[index]
+			state.apply_move(move)
+			if best_move is None:
+				child_v = -self.negamax(state, -beta, -alpha, curr_depth+1)
+			else:
+				child_v = -self.negamax(state, -alpha - NULL_WINDOW, -alpha, \
+					curr_depth+1)
+				if alpha < child_v < beta:
+					child_v = -self.negamax(state, -beta, -alpha, curr_depth+1)
+			state.undo()
+			if child_v > v:
+				v = child_v
+				best_move = move
+			if v >= beta:
+				if self.orderer is not None:
+					self.orderer.record_cutoff(move, curr_depth, depth)
+				if self.stats is not None:
+					self.stats.cutoff(curr_depth)
+				break
+			alpha = max(alpha, v)
+		self.store(state, depth, v, alpha_orig, beta, best_move)
+		return v
+
+	def search_window(self, state, alpha, beta):
+		"""Searches the root of the game tree within an (alpha, beta) window.
+
+		Same contract as AlphaBetaPlayer.search_window. Each root action
+		after the first is tested with a null window just below the value
+		it has to reach: above the best value so far, or equal to it for an
+		action that would win a tie.
+		"""
+		if self.stats is not None:
+			self.stats.visit(0)
+		moves, rank = self.root_moves(state)
+		best_move = None
+		best_rank = None
 		best_value = float('-Inf')
-		for action in state.actions():
-			v = self.min_value(state.transition(action), float('-Inf'), float('Inf'), 1)
-			# Because we consider all Stake moves first it makes sense to
-			# use v > best_value, because then even if a Raid action has
-			# the same value as a Stake value, we will use the Stake value
-			# (as instructed, ties are broken using Stake)
-			if v > best_value:
+		for move in moves:
+			move_rank = rank[move]
+			state.apply_move(move)
+			if best_move is None:
+				v = -self.negamax(state, -beta, -alpha, 1)
+			else:
+				floor = max(alpha, best_value)
+				if best_value > alpha and move_rank < best_rank:
+					floor = best_value - NULL_WINDOW
+				v = -self.negamax(state, -floor - NULL_WINDOW, -floor, 1)
+				if floor < v < beta:
+					v = -self.negamax(state, -beta, -floor, 1)
+			state.undo()
+			# ties are broken using Stake, i.e. the lower rank
+			if v > best_value or (v == best_value and \
+				(best_move is None or move_rank < best_rank)):
 				best_value = v
-				best_action = action
+				best_move = move
+				best_rank = move_rank
+			if best_value >= beta:
+				break
+		if self.table is not None and alpha < best_value < beta:
+			self.table.store(state.zobrist, self.max_depth, best_value, \
+				TranspositionTable.EXACT, state.canonical_move(best_move))
+		if best_move is None:
+			return best_value, None
+		return best_value, state.action(best_move)
+
+
+class SearchTimeout(Exception):
+	"""Raised inside the game tree when the current search runs out of time."""
+	pass
+
+
+class EndgameSolver:
+	"""Solves positions near the end of the game exactly.
+
+	remaining_spaces says exactly how many moves are left, so once few
+	cells are empty the rest of the game can be searched to the end. The
+	solver does this with negamax alpha-beta search and no depth limit or
+	evaluation: the value of a position is the final score margin it leads
+	to when both players play perfectly. Results are kept in a
+	transposition table of the solver's own, from the point of view of the
+	player to move. Solved values never go stale, so the table is not aged
+	between searches and positions solved for one move are not solved
+	again for the next.
+
+	Attributes:
+		max_cells: an integer of the most empty cells a position may have
+			for the solver to take it on.
+		table: the TranspositionTable of proven values and bounds.
+		deadline: the time.time() value at which solve gives up by raising
+			SearchTimeout, or None to never give up.
+		buffers: the MoveBuffers the nodes of a solve write their moves
+			into.
+		nodes: an integer count of the nodes visited by the last solve.
+		stats: the SearchStats that solves report their nodes, cutoffs and
+			table lookups to, or None to collect nothing.
+	"""
+	def __init__(self, max_cells=ENDGAME_CELLS, tt_size=TT_SIZE):
+		self.max_cells = max_cells
+		self.table = TranspositionTable(tt_size)
+		self.deadline = None
+		self.buffers = MoveBuffers()
+		self.nodes = 0
+		self.stats = None
+		self._root_spaces = 0
+
+	def applies(self, state):
+		"""Returns True if a position is close enough to the end to solve."""
+		return state.remaining_spaces <= self.max_cells
+
+	def negamax(self, state, alpha, beta):
+		"""Searches a position to the end of the game.
+
+		Args:
+			state: A Board object of the position.
+			alpha: The margin the player to move is already guaranteed.
+			beta: The margin above which the opponent will avoid this node.
+
+		Returns:
+			The final margin of the player to move under perfect play,
+			exact if it lies strictly between alpha and beta, otherwise a
+			bound on that side.
+		"""
+		self.nodes += 1
+		if self.stats is not None:
+			self.stats.visit(self._root_spaces - state.remaining_spaces)
+		if state.terminal():
+			return state.scores[state.turn] - state.scores[state.opponent]
+		if self.deadline is not None and time.time() >= self.deadline:
+			raise SearchTimeout()
+		hint = None
+		entry = self.table.probe(state.zobrist)
+		if entry is not None:
+			hint = state.oriented_move(entry[4])
+			if entry[3] == TranspositionTable.EXACT:
+				return entry[2]
+			elif entry[3] == TranspositionTable.LOWER:
+				alpha = max(alpha, entry[2])
+			else:
+				beta = min(beta, entry[2])
+			if alpha >= beta:
+				return entry[2]
+		alpha_orig = alpha
+		v = float('-Inf')
+		best_move = None
+		moves = self.buffers.get(state.remaining_spaces)
+		count = state.generate_moves(moves)
+		# the biggest immediate gains are the likeliest best moves
+		moves[:count] = sorted(moves[:count], key=state.move_gain, \
+			reverse=True)
+		hint_first(moves, count, hint)
+		for index in range(count):
+			move = moves[index]
+			state.apply_move(move)
+			child_v = -self.negamax(state, -beta, -alpha)
+			state.undo()
+			if child_v > v:
+				v = child_v
+				best_move = move
+			if v >= beta:
+				if self.stats is not None:
+					self.stats.cutoff(self._root_spaces - \
+						state.remaining_spaces)
+				break
+			alpha = max(alpha, v)
+		if v <= alpha_orig:
+			flag = TranspositionTable.UPPER
+		elif v >= beta:
+			flag = TranspositionTable.LOWER
+		else:
+			flag = TranspositionTable.EXACT
+		self.table.store(state.zobrist, state.remaining_spaces, v, flag, \
+			state.canonical_move(best_move))
+		return v
+
+	def solve(self, state):
+		"""Finds a perfect move and the final margin it guarantees.
+
+		Root actions are searched in generation order and a later action
+		only replaces the best one if it is strictly better, so ties are
+		broken the same way as by the other players.
+
+		Args:
+			state: A Board object of a position that is not terminal. It is
+				searched in place and left as it was.
+
+		Returns:
+			A tuple (margin, action) of the proven final margin of the
+			player to move and the first Action that achieves it.
+
+		Raises:
+			SearchTimeout: The deadline passed before the solve finished.
+		"""
+		self.nodes = 0
+		self._root_spaces = state.remaining_spaces
+		if self.stats is not None:
+			self.stats.visit(0)
+		probes, hits = self.table.probes, self.table.hits
+		best_value = float('-Inf')
+		best_move = None
+		try:
+			for move in state.unique_moves():
+				state.apply_move(move)
+				# only an action beating the best so far matters, so the
+				# child just has to be searched with the window above it
+				v = -self.negamax(state, float('-Inf'), -best_value)
+				state.undo()
+				if v > best_value:
+					best_value = v
+					best_move = move
+		finally:
+			if self.stats is not None:
+				self.stats.tt_probes += self.table.probes - probes
+				self.stats.tt_hits += self.table.hits - hits
+		return best_value, state.action(best_move)
+
+
+class CompetitionPlayer(AlphaBetaPlayer):
+	"""A game-playing AI for timed bot v. bot competitions.
+
+	Runs alpha-beta search with iterative deepening: the game tree is
+	searched to depth 1, then 2, then 3, and so on until the time budget
+	for the current move runs out. The returned action always comes from
+	the deepest iteration that finished, so an iteration interrupted by the
+	clock never produces a half-searched decision.
+
+	From depth 3 on, each iteration searches an aspiration window centred
+	on the value found two iterations earlier, since the value of a
+	position rarely moves far between depths of the same parity. If the
+	true value falls outside the window the iteration is repeated with
+	that side of the window opened up.
+
+	The iterations are run by search_window, so mixing this class with
+	another searcher (see PVSCompetitionPlayer) deepens that one instead.
+
+	Once few enough cells are empty, an EndgameSolver first tries to solve
+	the game exactly, since the depth cutoff easily misjudges the last few
+	Raids. If the solver runs out of its share of the time, the iterative
+	deepening search decides the move instead.
+
+	With an OpeningBook, positions found in the book are played without
+	searching, and the results of searches that reach BOOK_WRITE_DEPTH
+	are written back to it if it is writable.
+
+	Attributes:
+		my_player: A char ('X' or 'O') this bot is assigned to play as.
+		opponent: A char that is whichever char my_player is not.
+		cpu_remaining: A float of the seconds this bot has left for the
+			rest of the game.
+		max_depth: An integer of the depth of the iteration currently being
+			searched.
+		deadline: The time.time() value at which the current search must
+			stop, or None when no search is running.
+		completed_depth: An integer of the deepest iteration finished by
+			the last call to search.
+		aspiration: The half-width of the aspiration windows, or None to
+			search every iteration with a full window.
+		endgame: The EndgameSolver used near the end of the game, or None
+			to always search to a depth limit.
+		proven_margin: The final margin of this bot's score over its
+			opponent's that the last search proved it can guarantee, or
+			None if the last search did not solve the game.
+		book: The OpeningBook consulted before searching, or None.
+	"""
+	def __init__(self, my_player, opponent, cpu_remaining, tt_size=TT_SIZE, \
+		orderer=None, aspiration=ASPIRATION_WINDOW, evaluator=None, \
+		endgame_cells=ENDGAME_CELLS, book=None, quiescence_nodes=0):
+		if orderer is None:
+			orderer = MoveOrderer()
+		AlphaBetaPlayer.__init__(self, my_player, opponent, 1, tt_size, \
+			orderer, evaluator, quiescence_nodes)
+		self.cpu_remaining = cpu_remaining
+		self.deadline = None
+		self.completed_depth = 0
+		self.aspiration = aspiration
+		if endgame_cells:
+			self.endgame = EndgameSolver(endgame_cells, tt_size or TT_SIZE)
+		else:
+			self.endgame = None
+		self.proven_margin = None
+		self.book = book
+
+	def time_budget(self, state):
+		"""Determines how many seconds may be spent choosing the next move.
+
+		The remaining time is split evenly across the moves this bot still
+		has to make, since every move fills exactly one cell.
+
+		Args:
+			state: A Board object representing the root of the game tree.
+
+		Returns:
+			A float of the seconds available for this move.
+		"""
+		moves_left = max(1, (state.remaining_spaces + 1) // 2)
+		return TIME_SAFETY_FACTOR * self.cpu_remaining / moves_left
+
+	def cutoff_test(self, state, curr_depth):
+		"""Determines if the bot should stop searching the game tree.
+
+		Raises:
+			SearchTimeout: The deadline for the current move has passed.
+		"""
+		if time.time() >= self.deadline:
+			raise SearchTimeout()
+		return AlphaBetaPlayer.cutoff_test(self, state, curr_depth)
+
+	def aspiration_search(self, state, guess):
+		"""Runs one iteration, searching a window around a guessed value.
+
+		Args:
+			state: A Board object representing the root of the game tree.
+			guess: The expected root value, or None to use a full window.
+
+		Returns:
+			A tuple of the exact root value and the best Action.
+		"""
+		if guess is None or self.aspiration is None:
+			alpha = float('-Inf')
+			beta = float('Inf')
+		else:
+			alpha = guess - self.aspiration
+			beta = guess + self.aspiration
+		while True:
+			value, action = self.search_window(state, alpha, beta)
+			if value <= alpha and alpha != float('-Inf'):
+				alpha = float('-Inf')
+			elif value >= beta and beta != float('Inf'):
+				beta = float('Inf')
+			else:
+				return value, action
+
+	def search(self, state):
+		"""Determines the best move that can be found within the time budget.
+
+		Args:
+			state: A Board object representing the root of the game tree.
+
+		Returns:
+			The Action object stored in the book, or found by the endgame
+			solver, or else chosen by the deepest completed iteration. If
+			not even the depth 1 iteration finishes, the first legal action
+			is returned so the bot always has a move to play.
+		"""
+		start = time.time()
+		budget = self.time_budget(state)
+		self.completed_depth = 0
+		self.proven_margin = None
+		self.nodes = 0
+		self.value = None
+		if self.book is not None:
+			entry = self.book.probe(state)
+			# a hash collision could give a move that is illegal here
+			if entry is not None and entry[0] in state.actions():
+				self.value = entry[1]
+				self.completed_depth = entry[2]
+				self.cpu_remaining -= time.time() - start
+				return entry[0]
+		self.deadline = start + budget
+		if self.table is not None:
+			self.table.new_search()
+		if self.orderer is not None:
+			self.orderer.new_search()
+		state = state.copy()
+		self.buffers.new_search(state)
+		if self.stats is not None:
+			state = self.stats.start(self, state)
+		best_action = None
+		if not state.terminal():
+			best_action = state.action(state.unique_moves()[0])
+		if best_action is not None and self.endgame is not None and \
+			self.endgame.applies(state):
+			self.endgame.deadline = start + ENDGAME_TIME_SHARE * budget
+			self.endgame.stats = self.stats
+			try:
+				self.proven_margin, best_action = self.endgame.solve(state)
+				self.value = self.proven_margin
+				self.completed_depth = state.remaining_spaces
+			except SearchTimeout:
+				# unwind the actions the interrupted solve left applied
+				while state.undo_stack:
+					state.undo()
+			self.nodes += self.endgame.nodes
+		# values of the completed iterations, by depth
+		values = [None]
+		depth = 1
+		try:
+			while self.proven_margin is None and \
+				depth <= state.remaining_spaces:
+				self.max_depth = depth
+				# Values alternate with the parity of the depth, since the
+				# player who moves last at the horizon gets the last gain,
+				# so guess from two iterations back
+				guess = values[depth - 2] if depth >= 3 else None
+				self.value, best_action = self.aspiration_search(state, guess)
+				values.append(self.value)
+				self.completed_depth = depth
+				# Each iteration costs at least as much as all of the
+				# shallower ones combined, so don't start one that has
+				# no chance of finishing.
+				now = time.time()
+				if self.deadline - now < now - start:
+					break
+				depth += 1
+		except SearchTimeout:
+			# unwind the moves the interrupted iteration left applied, so
+			# the book entry below is stored under the root
+			while state.undo_stack:
+				state.undo()
+		if self.stats is not None:
+			self.stats.finish(self)
+		if self.book is not None and self.book.writable and \
+			self.completed_depth >= BOOK_WRITE_DEPTH:
+			self.book.store(state, self.completed_depth, self.value, \
+				best_action)
+		self.deadline = None
+		self.cpu_remaining -= time.time() - start
+		return best_action
+
+
+class PVSCompetitionPlayer(CompetitionPlayer, PVSPlayer):
+	"""A CompetitionPlayer whose iterations use principal variation search."""
+	pass
+
+
+class Ponderer:
+	"""Searches on the opponent's time.
+
+	While the opponent decides on a move, the ponderer searches the
+	positions each of their replies would leave the bot in, with the bot's
+	own player, so that the results land in the player's transposition
+	table. The replies are searched a depth at a time: first the predicted
+	reply (the best reply the player's last search found), then the rest
+	by how much they gain, then all of them again one ply deeper. When the
+	real move arrives, pondering is stopped and the player searches as
+	usual; the subtree of the move played is then mostly answered from the
+	table, or, for a CompetitionPlayer, its iterations reach the pondered
+	depth almost at once and carry on from there.
+
+	A ponderer either runs in a background thread (start and stop), which
+	suits waiting on a human typing since the waiting thread holds no
+	lock, or in the caller's thread until told to stop (ponder).
+
+	Attributes:
+		player: The AlphaBetaPlayer (or subclass) that will search the
+			bot's next move. Players without a transposition table are
+			not pondered for.
+		depths: A dict mapping the Action of each pondered reply to the
+			deepest search of it that finished.
+		nodes: An integer count of the nodes searched while pondering.
+		thread: The background thread, or None when none is running.
+	"""
+	def __init__(self, player):
+		self.player = player
+		self.depths = {}
+		self.nodes = 0
+		self.thread = None
+		self.stopping = threading.Event()
+
+	def replies(self, state):
+		"""Lists the move codes of the opponent's replies in the order they
+		are pondered.
+		"""
+		hint = None
+		entry = self.player.table.probe(state.zobrist)
+		if entry is not None:
+			hint = state.oriented_move(entry[4])
+		moves = sorted(state.unique_moves(), key=state.move_gain, \
+			reverse=True)
+		# the hint may be the twin of a move that was left out
+		if hint in moves:
+			hint_first(moves, len(moves), hint)
+		return moves
+
+	def ponder(self, state, should_stop, check_nodes=PONDER_CHECK_NODES):
+		"""Ponders until should_stop says to or nothing is left to search.
+
+		Args:
+			state: A Board object with the opponent to move. It is not
+				changed.
+			should_stop: A function of no arguments returning True once
+				pondering should end, called every check_nodes nodes.
+			check_nodes: An integer of the nodes searched between calls to
+				should_stop.
+
+		Returns:
+			The depths attribute.
+		"""
+		player = self.player
+		self.depths = {}
+		self.nodes = 0
+		if player.table is None or state.remaining_spaces < 2:
+			return self.depths
+		# a fixed-depth player is only pondered to the depth it searches
+		# to, a timed one as deep as the game goes
+		limit = state.remaining_spaces - 1
+		if not hasattr(player, 'deadline'):
+			limit = min(limit, player.max_depth)
+		saved = (player.max_depth, player.stats, player.nodes, player.value, \
+			getattr(player, 'deadline', None))
+		cutoff_test = player.cutoff_test
+		next_check = [check_nodes]
+
+		def ponder_cutoff_test(node, curr_depth):
+			if player.nodes >= next_check[0]:
+				next_check[0] = player.nodes + check_nodes
+				if should_stop():
+					raise SearchTimeout()
+			return cutoff_test(node, curr_depth)
+
+		# stop through the searches' depth checks, as SearchStats times
+		# evaluation, by shadowing the method on the instance
+		player.cutoff_test = ponder_cutoff_test
+		player.stats = None
+		if hasattr(player, 'deadline'):
+			player.deadline = float('Inf')
+		state = state.copy()
+		player.table.new_search()
+		try:
+			replies = self.replies(state)
+			for depth in range(1, limit + 1):
+				for reply in replies:
+					if should_stop():
+						return self.depths
+					player.nodes = 0
+					player.max_depth = depth
+					next_check[0] = check_nodes
+					action = state.action(reply)
+					state.apply_move(reply)
+					try:
+						player.search_window(state, float('-Inf'), \
+							float('Inf'))
+					finally:
+						self.nodes += player.nodes
+					state.undo()
+					self.depths[action] = depth
+		except SearchTimeout:
+			pass
+		finally:
+			del player.cutoff_test
+			player.max_depth, player.stats, player.nodes, player.value, \
+				deadline = saved
+			if hasattr(player, 'deadline'):
+				player.deadline = deadline
+		return self.depths
+
+	def start(self, state):
+		"""Starts pondering state in a background thread."""
+		self.stop()
+		self.stopping.clear()
+		self.thread = threading.Thread(target=self.ponder, \
+			args=(state, self.stopping.is_set, 1))
+		self.thread.daemon = True
+		self.thread.start()
+
+	def stop(self, action=None):
+		"""Stops the background thread, if any, and waits for it to end.
+
+		Must be called before the player searches again.
+
+		Args:
+			action: The reply the opponent played, or None.
+
+		Returns:
+			The depth action was pondered to, 0 if it was not.
+		"""
+		if self.thread is not None:
+			self.stopping.set()
+			self.thread.join()
+			self.thread = None
+		if action is None:
+			return 0
+		return self.depths.get(action, 0)
+
+
+# State of a ParallelAlphaBetaPlayer worker process, set up once per pool
+# by _init_parallel_worker.
+_parallel_worker = {}
+
+
+def _init_parallel_worker(board_class, values, my_player, opponent, \
+	tt_size, use_orderer, shared_alpha, collect_stats, evaluator=None, \
+	quiescence_nodes=0):
+	"""Creates the searcher a worker process uses for every root action."""
+	if use_orderer:
+		orderer = MoveOrderer()
+	else:
+		orderer = None
+	_parallel_worker['player'] = AlphaBetaPlayer(my_player, opponent, 1, \
+		tt_size, orderer, evaluator, quiescence_nodes)
+	_parallel_worker['board_class'] = board_class
+	_parallel_worker['values'] = values
+	_parallel_worker['alpha'] = shared_alpha
+	_parallel_worker['search_id'] = None
+	_parallel_worker['collect_stats'] = collect_stats
+
+
+def _search_root_action(task):
+	"""Searches the subtree of one root action in a worker process.
+
+	The search is bounded below by the best root value any worker has
+	proven so far, and publishes its own value if it improves on that.
+
+	Args:
+		task: A tuple (search_id, board code, action code, max_depth).
+
+	Returns:
+		A tuple (action code, value, alpha the search used, nodes visited,
+		SearchStats or None). The value is exact if it is greater than that
+		alpha, otherwise it is only an upper bound. SearchStats are only
+		collected when the player that created the pool had stats on.
+	"""
+	search_id, board_code, action_code, max_depth = task
+	player = _parallel_worker['player']
+	shared_alpha = _parallel_worker['alpha']
+	board = _parallel_worker['board_class'].decode(board_code, \
+		_parallel_worker['values'])
+	if search_id != _parallel_worker['search_id']:
+		_parallel_worker['search_id'] = search_id
+		if player.table is not None:
+			player.table.new_search()
+		player.buffers.new_search(board)
+	player.max_depth = max_depth
+	player.nodes = 0
+	board.apply_move(action_code)
+	stats = None
+	if _parallel_worker['collect_stats']:
+		stats = player.stats = SearchStats()
+		board = stats.start(player, board)
+	alpha = shared_alpha.value
+	v = player.min_value(board, alpha, float('Inf'), 1)
+	if stats is not None:
+		stats.finish(player)
+		player.stats = None
+	if v > alpha:
+		with shared_alpha.get_lock():
+			if v > shared_alpha.value:
+				shared_alpha.value = v
+	return action_code, v, alpha, player.nodes, stats
+
+
+class ParallelAlphaBetaPlayer(AlphaBetaPlayer):
+	"""An AlphaBetaPlayer that searches root actions on several processes.
+
+	Each root action is searched by a worker of a multiprocessing pool. The
+	best root value proven by any worker is kept in shared memory and used
+	as alpha by every root action that starts after it, so later actions
+	still get most of the pruning a serial search would give them. Boards
+	and actions are sent to workers in their compact encode() forms; the
+	values grid is only sent when the pool is created.
+
+	The chosen action is the same as AlphaBetaPlayer's, including the
+	Stake-before-Raid tie-break: a root action whose bounded search came
+	back exactly equal to the best value and that would win the tie is
+	searched again to find out whether it really ties.
+
+	Attributes:
+		processes: An integer of the number of worker processes.
+		pool: The multiprocessing pool, created on the first search and
+			kept until close is called or a game with other values starts.
+		Others as in AlphaBetaPlayer; table and orderer are used for the
+		root and each worker keeps its own.
+	"""
+	def __init__(self, my_player, opponent, max_depth, tt_size=TT_SIZE, \
+		orderer=None, processes=None, evaluator=None, quiescence_nodes=0):
+		AlphaBetaPlayer.__init__(self, my_player, opponent, max_depth, \
+			tt_size, orderer, evaluator, quiescence_nodes)
+		self.processes = processes or multiprocessing.cpu_count()
+		self.tt_size = tt_size
+		self.pool = None
+		self.pool_key = None
+		self.shared_alpha = None
+		self.search_id = 0
+
+	def close(self):
+		"""Shuts down the worker processes."""
+		if self.pool is not None:
+			self.pool.terminate()
+			self.pool.join()
+			self.pool = None
+			self.pool_key = None
+
+	def worker_pool(self, state):
+		"""Returns a pool whose workers know the values grid of state."""
+		key = (type(state), state.values, self.stats is not None)
+		if self.pool is None or self.pool_key != key:
+			self.close()
+			self.shared_alpha = multiprocessing.Value('d', float('-Inf'))
+			self.pool = multiprocessing.Pool(self.processes, \
+				_init_parallel_worker, (type(state), state.values, \
+				self.my_player, self.opponent, self.tt_size, \
+				self.orderer is not None, self.shared_alpha, \
+				self.stats is not None, self.evaluator, \
+				self.quiescence_nodes))
+			self.pool_key = key
+		return self.pool
+
+	def search(self, state):
+		"""Determines the best possible move given the current game board.
+
+		Args:
+			state: A Board object representing the root of the game tree.
+
+		Returns:
+			The Action object with the highest value across all actions.
+		"""
+		self.nodes = 0
+		if self.table is not None:
+			self.table.new_search()
+		if self.orderer is not None:
+			self.orderer.new_search()
+		state = state.copy()
+		self.buffers.new_search(state)
+		pool = self.worker_pool(state)
+		if self.stats is not None:
+			state = self.stats.start(self, state)
+		moves, rank = self.root_moves(state)
+		if self.max_depth < 2 or len(moves) < 2:
+			self.value, best_action = self.search_window(state, \
+				float('-Inf'), float('Inf'))
+		else:
+			best_action = self.parallel_search(pool, state, moves, rank)
+		if self.stats is not None:
+			self.stats.finish(self)
 		return best_action
 
-def generate_player_and_board(filename):
+	def parallel_search(self, pool, state, moves, rank):
+		"""Searches the root moves on the worker pool.
+
+		Args:
+			pool: The pool from worker_pool.
+			state: A Board object representing the root of the game tree.
+			moves, rank: The root move codes and ranks from root_moves.
+
+		Returns:
+			The best Action. Its value is left in self.value.
+		"""
+		self.search_id += 1
+		self.shared_alpha.value = float('-Inf')
+		if self.stats is not None:
+			self.stats.visit(0)
+		board_code = state.encode()
+		tasks = [(self.search_id, board_code, move, self.max_depth) \
+			for move in moves]
+		results = []
+		for code, v, alpha, nodes, stats in pool.imap_unordered( \
+			_search_root_action, tasks):
+			results.append((code, v, alpha))
+			self.nodes += nodes
+			if stats is not None and self.stats is not None:
+				self.stats.merge(stats)
+
+		best_value = max(v for code, v, alpha in results if v > alpha)
+		self.value = best_value
+		# ties are broken using Stake, i.e. the lower rank
+		results.sort(key=lambda result: rank[result[0]])
+		for code, v, alpha in results:
+			if v != best_value:
+				continue
+			if v <= alpha:
+				# v may only be an upper bound; check for a real tie
+				state.apply_move(code)
+				v = self.min_value(state, float('-Inf'), best_value, 1)
+				state.undo()
+				if v < best_value:
+					continue
+			return state.action(code)
+
+
+# State of an MCTSPlayer worker process, set up once per pool by
+# _init_mcts_worker.
+_mcts_worker = {}
+
+
+def _init_mcts_worker(board_class, values):
+	"""Sets up a worker process of a root-parallel MCTSPlayer."""
+	_mcts_worker['board_class'] = board_class
+	_mcts_worker['values'] = values
+
+
+def _grow_mcts_tree(task):
+	"""Grows one search tree in a worker process.
+
+	Args:
+		task: A tuple (board code, iterations, seconds, exploration, seed).
+
+	Returns:
+		The tuple returned by MCTSPlayer.grow.
+	"""
+	board_code, iterations, seconds, exploration, seed = task
+	board = _mcts_worker['board_class'].decode(board_code, \
+		_mcts_worker['values'])
+	player = MCTSPlayer(board.turn, board.opponent, iterations, seconds, \
+		exploration, seed=seed)
+	return player.grow(board)
+
+
+class MCTSPlayer:
+	"""A game-playing AI using Monte Carlo tree search with UCT.
+
+	Instead of searching every action to a fixed depth, the player grows a
+	search tree one playout at a time. Each iteration walks down the tree
+	picking the child with the best UCT score (its average reward plus an
+	exploration bonus that shrinks as it is visited more), expands the
+	leaf it reaches, plays random moves from there to the end of the game,
+	and adds the result to every node on the path. The root action played
+	most often is chosen.
+
+	The reward of a playout is 0.5 plus half the final margin as a share
+	of the total value of the board, rather than 1 for a win and 0 for a
+	loss: the outcome of a random playout is mostly noise, and the margin
+	keeps more of what signal there is. Since the cost of an iteration
+	grows with the board rather than with the branching factor, this still
+	gives useful moves on boards far too wide for full-width search.
+
+	The tree is kept as parallel lists indexed by node number, and the
+	children of a node are numbered consecutively, so a node is a handful
+	of list entries rather than an object. Playouts run on a scratch list
+	of the board's cells and never create Action or Board objects: each
+	step takes a random empty cell, as a Raid if the player to move owns a
+	neighbor (a Raid never earns less than a Stake) and as a Stake
+	otherwise.
+
+	With several processes the search is root-parallel: every worker grows
+	its own tree from its own seed, and the visit counts of the root
+	actions are added up.
+
+	Attributes:
+		my_player: A char ('X' or 'O') this bot is assigned to play as.
+		opponent: A char that is whichever char my_player is not.
+		iterations: An integer of the playouts run per move, per process,
+			when seconds is None.
+		seconds: A float of the seconds each move may take, or None to run
+			a fixed number of iterations.
+		exploration: The UCT exploration constant.
+		processes: An integer of the number of worker processes, 1 to
+			search in this process.
+		rng: The random.Random the playouts draw from.
+		nodes: An integer count of the playouts of the last search.
+		value: The final margin of my_player the playouts through the
+			chosen action averaged, or None if there was no action.
+		pool: The multiprocessing pool of a root-parallel player, created
+			on the first search and kept until close is called or a game
+			with other values starts.
+	"""
+	def __init__(self, my_player, opponent, iterations=MCTS_ITERATIONS, \
+		seconds=None, exploration=UCT_EXPLORATION, processes=1, seed=None):
+		self.my_player = my_player
+		self.opponent = opponent
+		self.iterations = iterations
+		self.seconds = seconds
+		self.exploration = exploration
+		self.processes = processes
+		self.rng = random.Random(seed)
+		self.nodes = 0
+		self.value = None
+		self.pool = None
+		self.pool_key = None
+
+	def close(self):
+		"""Shuts down the worker processes."""
+		if self.pool is not None:
+			self.pool.terminate()
+			self.pool.join()
+			self.pool = None
+			self.pool_key = None
+
+	def playout(self, board):
+		"""Plays random moves from a position to the end of the game.
+
+		Args:
+			board: A Board object of the position. It is not changed.
+
+		Returns:
+			X's final score minus O's.
+		"""
+		geometry = board.geometry
+		flat_values = geometry.flat_values
+		neighbors = geometry.neighbors
+		random = self.rng.random
+		cells = list(board.cells)
+		empty = [index for index in range(len(cells)) if cells[index] == '.']
+		count = len(empty)
+		margin = board.scores['X'] - board.scores['O']
+		turn = board.turn
+		opponent = board.opponent
+		while count:
+			pick = int(random() * count)
+			count -= 1
+			index = empty[pick]
+			empty[pick] = empty[count]
+			gain = flat_values[index]
+			adjacent = neighbors[index]
+			raid = False
+			for cell in adjacent:
+				if cells[cell] == turn:
+					raid = True
+					break
+			if raid:
+				# the mover also takes what the opponent loses
+				for cell in adjacent:
+					if cells[cell] == opponent:
+						cells[cell] = turn
+						gain += 2 * flat_values[cell]
+			cells[index] = turn
+			if turn == 'X':
+				margin += gain
+			else:
+				margin -= gain
+			turn, opponent = opponent, turn
+		return margin
+
+	def grow(self, state):
+		"""Runs the iterations of one search tree.
+
+		Args:
+			state: A Board object representing the root of the game tree.
+				It is not changed.
+
+		Returns:
+			A tuple (codes, visits, rewards, iterations) of the lists of
+			the root move codes (see Action.encode), of the playouts
+			through each, and of the sum of their rewards for the player to
+			move at the root, and the number of iterations run.
+		"""
+		board = state.copy()
+		positions = board.geometry.positions
+		exploration = self.exploration
+		deadline = None
+		if self.seconds is not None:
+			deadline = time.time() + self.seconds
+		# the node table, whose moves are move codes; the children of node
+		# i are the nodes first[i] to first[i] + counts[i] - 1, and
+		# counts[i] is -1 until node i is expanded
+		moves = [None]
+		buffer = [0] * (2*board.n*board.n)
+		first = [0]
+		counts = [-1]
+		visits = [0]
+		rewards = [0.0]
+		root_player = board.turn
+		total = float(sum(board.geometry.flat_values)) or 1.0
+		iterations = 0
+		while True:
+			if deadline is None:
+				if iterations >= self.iterations:
+					break
+			elif time.time() >= deadline and iterations:
+				break
+			iterations += 1
+			node = 0
+			path = [0]
+			# selection
+			while counts[node] > 0:
+				log_visits = math.log(visits[node])
+				best = None
+				best_score = float('-Inf')
+				for child in range(first[node], first[node] + counts[node]):
+					child_visits = visits[child]
+					if not child_visits:
+						best = child
+						break
+					score = rewards[child] / child_visits + \
+						exploration * math.sqrt(log_visits / child_visits)
+					if score > best_score:
+						best = child
+						best_score = score
+				node = best
+				path.append(node)
+				board.apply_move(moves[node])
+			# expansion
+			if counts[node] < 0 and (visits[node] or node == 0) and \
+				not board.terminal():
+				if node == 0:
+					children = board.unique_moves()
+				else:
+					children = buffer[:board.generate_moves(buffer)]
+				first[node] = len(moves)
+				counts[node] = len(children)
+				moves.extend(children)
+				first.extend([0] * len(children))
+				counts.extend([-1] * len(children))
+				visits.extend([0] * len(children))
+				rewards.extend([0.0] * len(children))
+				node = first[node]
+				path.append(node)
+				board.apply_move(moves[node])
+			# simulation
+			margin = self.playout(board)
+			x_reward = 0.5 + 0.5 * margin / total
+			# backpropagation; a node's rewards are those of the player
+			# who moved into it, which alternates from the root's player
+			mover = root_player
+			for depth in range(len(path)):
+				node = path[depth]
+				visits[node] += 1
+				if depth:
+					rewards[node] += x_reward if mover == 'X' else \
+						1 - x_reward
+					mover = 'O' if mover == 'X' else 'X'
+			while board.undo_stack:
+				board.undo()
+		children = range(first[0], first[0] + max(counts[0], 0))
+		return [moves[child] for child in children], \
+			[visits[child] for child in children], \
+			[rewards[child] for child in children], iterations
+
+	def worker_pool(self, state):
+		"""Returns a pool whose workers know the values grid of state."""
+		key = (type(state), state.values)
+		if self.pool is None or self.pool_key != key:
+			self.close()
+			self.pool = multiprocessing.Pool(self.processes, \
+				_init_mcts_worker, (type(state), state.values))
+			self.pool_key = key
+		return self.pool
+
+	def search(self, state):
+		"""Determines the most promising move given the current game board.
+
+		Args:
+			state: A Board object representing the root of the game tree.
+
+		Returns:
+			The root Action with the most playouts, ties going to the
+			action generated first, or None if the game is over.
+		"""
+		if self.processes > 1:
+			tasks = [(state.encode(), self.iterations, self.seconds, \
+				self.exploration, self.rng.getrandbits(32)) \
+				for worker in range(self.processes)]
+			trees = self.worker_pool(state).map(_grow_mcts_tree, tasks)
+		else:
+			trees = [self.grow(state)]
+		codes = trees[0][0]
+		visits = [sum(tree[1][index] for tree in trees) \
+			for index in range(len(codes))]
+		rewards = [sum(tree[2][index] for tree in trees) \
+			for index in range(len(codes))]
+		self.nodes = sum(tree[3] for tree in trees)
+		self.value = None
+		if not codes:
+			return None
+		best = visits.index(max(visits))
+		if visits[best]:
+			total = sum(state.flat_values)
+			reward = rewards[best] / visits[best]
+			self.value = (2 * reward - 1) * total
+			if state.turn != self.my_player:
+				self.value = -self.value
+		return state.action(codes[best])
+
+
+def set_move_time(player, state, seconds):
+	"""Puts a player's next search under a per-move time control.
+
+	Players that budget a whole game's clock (CompetitionPlayer) are given
+	the control for each move they have left, and an MCTSPlayer plays out
+	until the control's time is up instead of running a fixed number of
+	iterations. Depth-limited players have no clock and are left as they
+	are.
+
+	Args:
+		player: the player about to search.
+		state: the Board it is about to search on.
+		seconds: the float seconds the move may take.
+	"""
+	if hasattr(player, 'cpu_remaining'):
+		moves_left = max(1, (state.remaining_spaces + 1) // 2)
+		player.cpu_remaining = seconds * moves_left
+	elif isinstance(player, MCTSPlayer):
+		player.seconds = TIME_SAFETY_FACTOR * seconds
+
+
+def generate_player_and_board(filename, board_class=Board):
 	"""Reads an inpt file to determine the current game state.
 
 	For purposes of the competition, input files are provided to the AI
@@ -513,67 +3799,146 @@ def generate_player_and_board(filename):
 
 	Args:
 		filename: A string of the input file path to be read.
+		board_class: The Board backend to store the game in, either Board
+			or BitBoard.
 
 	Returns:
 		A tuple containing a Board object representing the inital board
 		configuration and a Player determined by the mode of the input.
+
+	Raises:
+		gang_io.InputError: if the file is not in the input format.
 	"""
-	start_state = []
-	start_scores = {'X':0, 'O':0}
-	values = []
-	my_player = ''
-	opponent = ''
-	max_depth = 0
-	n = 0
 	with open(filename, 'r') as f:
-		lines = f.readlines()
-		n = int(lines[0].strip())
-		mode = lines[1].strip()
-		my_player = lines[2].strip()
-		if my_player == 'X':
-			opponent = 'O'
-		else:
-			opponent = 'X'
-		if mode == 'COMPETITION':
-			cpu_remaining = float(lines[3].strip())
-		else:
-			max_depth = int(lines[3].strip())
-		for i in range(4, n+4):
-			values.append([int(x) for x in lines[i].split()])
-		for j in range(i+1, n+i+1):
-			start_state.append(list(lines[j].strip()))
-
-	remaining_spaces = n**2
-	for row in range(n):
-		for col in range(n):
-			if start_state[row][col] != '.':
-				remaining_spaces -= 1
-				start_scores[start_state[row][col]] += values[row][col]
-
-	start_board = Board(n, start_state, values, my_player, \
-		remaining_spaces=remaining_spaces, scores=start_scores)
+		position = gang_io.read_position(f, filename)
+	return make_player_and_board(position, board_class)
+
+
+def read_player_and_board(lines, board_class=Board):
+	"""Builds the start board and player from the lines of one input.
+
+	Args:
+		lines: An iterable of the lines of one position in the input format.
+		board_class: The Board backend to store the game in.
+
+	Returns:
+		A tuple (Board, Player) as in generate_player_and_board.
+	"""
+	return make_player_and_board(gang_io.read_position(lines), board_class)
+
+
+def make_player_and_board(position, board_class=Board):
+	"""Builds the start board and player of a parsed position.
+
+	Args:
+		position: A gang_io.Position.
+		board_class: The Board backend to store the game in.
+
+	Returns:
+		A tuple (Board, Player) as in generate_player_and_board.
+	"""
+	# built once here and shared by every board the search creates
+	geometry = Geometry.for_values(position.values)
+	start_board = board_class(position.n, position.state, position.values, \
+		position.player, remaining_spaces=position.remaining_spaces, \
+		scores=dict(position.scores), geometry=geometry)
+	mode = position.mode
 	if mode == 'MINIMAX':
-		ai = MinimaxPlayer(start_board.turn, start_board.opponent, max_depth)
+		ai = MinimaxPlayer(start_board.turn, start_board.opponent, \
+			position.depth)
 	elif mode == 'ALPHABETA':
-		ai = AlphaBetaPlayer(start_board.turn, start_board.opponent, max_depth)
+		ai = AlphaBetaPlayer(start_board.turn, start_board.opponent, \
+			position.depth, orderer=MoveOrderer())
+	elif mode == 'PVS':
+		ai = PVSPlayer(start_board.turn, start_board.opponent, \
+			position.depth, orderer=MoveOrderer())
+	elif mode == 'COMPETITION':
+		ai = PVSCompetitionPlayer(start_board.turn, start_board.opponent, \
+			position.cpu_remaining)
 
 	return (start_board, ai)
 
 
+def format_output(decision, result):
+	"""Formats a decision and the board it leads to as in 'output.txt'.
+
+	Args:
+		decision: The Action the bot chose.
+		result: The Board after applying decision.
+
+	Returns:
+		A string of the move line followed by the rows of the board.
+	"""
+	return gang_io.format_output(decision, result)
+
+
 
 if __name__ == '__main__':
-	from copy import deepcopy
+	import argparse
+	import json
+	import os
+	parser = argparse.ArgumentParser(description="Plays one move of Gang " \
+		"War from 'input.txt' and writes it to 'output.txt'.")
+	parser.add_argument('--stats', nargs='?', const='-', metavar='FILE', \
+		help='dump search statistics as JSON to FILE (default: stdout)')
+	parser.add_argument('--evaluation', choices=['score', 'numpy'], \
+		default='score', help='leaf evaluation: the score difference or ' \
+		'NumpyEvaluator (default: %(default)s)')
+	parser.add_argument('--book', metavar='FILE', help='opening book used ' \
+		'and extended in COMPETITION mode, created if missing')
+	parser.add_argument('--quiescence', nargs='?', type=int, \
+		const=QUIESCENCE_NODES, default=0, metavar='NODES', \
+		help='extend the alpha-beta searches with a quiescence search on ' \
+		'capturing Raids of at most NODES nodes per leaf (default when ' \
+		'given: %(const)s)')
+	parser.add_argument('--profile', metavar='FILE', help='sample where ' \
+		'the search spends its time and write the profile to FILE: a ' \
+		'Chrome trace if FILE ends in .json, else collapsed stacks for ' \
+		'flamegraph.pl')
+	parser.add_argument('--profile-interval', type=float, \
+		default=PROFILE_INTERVAL, metavar='SECONDS', help='time between ' \
+		'profile samples (default: %(default)s)')
+	args = parser.parse_args()
 	# Read the input file to generate the start board and the player bot
 	start_board, ai = generate_player_and_board('input.txt')
+	if args.evaluation == 'numpy':
+		ai.evaluator = NumpyEvaluator()
+	if args.quiescence and isinstance(ai, AlphaBetaPlayer):
+		ai.quiescence_nodes = args.quiescence
+	if args.book is not None and isinstance(ai, CompetitionPlayer):
+		if os.path.exists(args.book):
+			ai.book = OpeningBook(args.book, writable=True)
+		else:
+			ai.book = OpeningBook.create(args.book)
+	if args.stats is not None:
+		ai.stats = SearchStats()
+	if args.profile is not None:
+		profiler = SearchProfiler(args.profile_interval)
+		profiler.start()
 	# Use the bot's search to determine the best action to take
 	decision = ai.search(start_board)
+	if args.profile is not None:
+		profiler.stop()
+		with open(args.profile, 'w') as f:
+			if args.profile.endswith('.json'):
+				profiler.write_chrome_trace(f)
+			else:
+				profiler.write_collapsed(f)
 	# Apply the action to the start board
 	result = start_board.transition(decision)
 	# Write the action and resulting board to the output file
 	with open('output.txt', 'w') as f:
-		f.write('{}'.format(decision))
-		for row in result.state:
-			f.write('\n{}'.format(''.join(row)))
+		gang_io.write_output(f, decision, result)
+	if args.stats is not None:
+		report = ai.stats.as_dict()
+		report['proven_margin'] = getattr(ai, 'proven_margin', None)
+		if args.profile is not None:
+			report['profile'] = profiler.summary()
+	if args.stats == '-':
+		print(json.dumps(report, indent=2))
+	elif args.stats is not None:
+		with open(args.stats, 'w') as f:
+			json.dump(report, f, indent=2)
 
 
 
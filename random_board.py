@@ -1,21 +1,39 @@
-from random import random, randint
+import random as _random
 
-def random_board(blank=False):
-	n = randint(3, 4)
-	chance = random()
+def random_board(blank=False, n=None, fill=None, rng=None):
+	"""Generates a random board and cell values.
+
+	Args:
+		blank: if True, every cell is left empty.
+		n: the board size, or None for a random size of 3 or 4.
+		fill: the chance [0, 1] that each cell is occupied, or None for a
+			random chance.
+		rng: a random.Random to draw from, so boards can be reproduced from
+			a seed, or None to use the module-level generator.
+
+	Returns:
+		A tuple (board, values, n) where board is a 2D array of 'X', 'O' and
+		'.' cells and values a 2D array of cell values from 1 to 99.
+	"""
+	if rng is None:
+		rng = _random
+	if n is None:
+		n = rng.randint(3, 4)
+	if fill is None:
+		chance = rng.random()
+	else:
+		chance = 1 - fill
 	board = [['.' for i in range(n)] for j in range(n)]
 	values = [[0 for i in range(n)] for j in range(n)]
 	for row in range(n):
 		for col in range(n):
-			val = randint(1,99)
+			val = rng.randint(1,99)
 			values[row][col] = val
 			if not blank:
-				if random() > chance:
-					player = randint(0,1)
+				if rng.random() > chance:
+					player = rng.randint(0,1)
 					if player == 1:
 						board[row][col] = 'X'
 					else:
 						board[row][col] = 'O'
 	return (board, values, n)
-
-
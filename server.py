@@ -0,0 +1,670 @@
+"""
+File: server.py
+---------------
+An asyncio match server hosting many concurrent Gang War games in one
+process, for bot v. bot tournaments and human v. bot play.
+
+Usage:
+
+	python server.py [--host HOST] [--port PORT | --unix PATH] [--workers N]
+		[--ponder-workers N | --no-ponder]
+
+Clients (see client.py) talk to the server over TCP or a Unix socket with
+a line protocol. Every message is one line of space-separated words.
+Commands sent by a client:
+
+	NEW <X side> <O side> <seconds> [<n> [<seed>]]
+		Starts a match on a blank board with random values (n from 3 to
+		26, random if left out; the same seed gives the same values).
+		Each side is 'human' or an engine of ENGINES, optionally with a
+		search depth, e.g. 'alphabeta:4'. seconds is the per-move time
+		control: a side that takes longer loses the match. The client
+		creating the match is subscribed to it.
+	WATCH <match>	Subscribes to the events of a match.
+	MOVE <match> <cell> <S|R>
+		Plays a human side's move, e.g. 'MOVE 3 B2 S'. Any subscriber may
+		move for a human side, so two clients can play each other.
+	BOARD <match>	Sends the match's VALUES and STATE again.
+	RESIGN <match>	Ends the match; the human side loses, or the side to
+			move if both or neither side is human.
+	LIST		Sends one MATCH line per match being played.
+	QUIT		Closes the connection.
+
+Every command but QUIT is answered by exactly one OK or ERROR, after
+any messages it asked for. Other messages sent by the server:
+
+	OK [<match>]			reply to a command that succeeded,
+					with the new match's id for NEW
+	ERROR <message>			reply to a command that failed
+	MATCH <match> <X side> <O side> <turn>	sent for LIST
+	VALUES <match> <row>/<row>/...		cell values, rows of
+						comma-separated integers
+	STATE <match> <turn> <X score> <O score> <row>/<row>/...
+	TURN <match> <player>		a human side is to move
+	MOVED <match> <player> <cell> <Stake|Raid> <seconds>
+	OVER <match> <X|O|DRAW> <X score> <O score> <reason>
+		reason is 'end', 'timeout', 'resign' or 'error'
+
+Engine searches run in a pool of worker processes, so they neither block
+the event loop nor each other. A match whose last subscriber disconnects
+is abandoned.
+
+While a human side is thinking, the engine playing against it ponders
+(see homework.Ponderer) in a worker process, unless the server is started
+with --no-ponder. The human's move is passed to that process, which then
+searches the engine's reply with everything it pondered still in its
+transposition table. The engine's time control starts when the human
+moves, as without pondering. A ponderer holds its process for the whole
+of the human's turn, so ponderers get a pool of their own
+(--ponder-workers) and never take a worker from the engine searches; when
+every ponder worker is busy, the engine simply does not ponder that turn.
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import multiprocessing
+import random
+import sys
+import time
+
+from homework import Board, Action, Geometry, MinimaxPlayer, AlphaBetaPlayer, \
+	PVSPlayer, PVSCompetitionPlayer, MCTSPlayer, MoveOrderer, Ponderer, \
+	SearchTimeout, set_move_time
+from random_board import random_board
+
+# Search depth of depth-limited engines whose side gives none.
+DEFAULT_DEPTH = 3
+
+# Seconds an engine may overrun the per-move time control before it loses
+# on time, covering the transfer to and from the worker process.
+GRACE_SECONDS = 1.0
+
+# Number of engine players each worker process keeps between moves, so
+# that their transposition tables carry over, and of match geometries.
+PLAYER_CACHE = 64
+
+# name -> function(my_player, opponent, depth) -> player
+ENGINES = {
+	'minimax': lambda me, opponent, depth: \
+		MinimaxPlayer(me, opponent, depth),
+	'alphabeta': lambda me, opponent, depth: \
+		AlphaBetaPlayer(me, opponent, depth, orderer=MoveOrderer()),
+	'pvs': lambda me, opponent, depth: \
+		PVSPlayer(me, opponent, depth, orderer=MoveOrderer()),
+	# searches as deep as the time control allows; depth is ignored
+	'competition': lambda me, opponent, depth: \
+		PVSCompetitionPlayer(me, opponent, 0.0),
+	# depth is the thousands of playouts per move, but under a time
+	# control (see homework.set_move_time) playouts run until its time is
+	# up
+	'mcts': lambda me, opponent, depth: \
+		MCTSPlayer(me, opponent, iterations=1000 * depth),
+}
+
+# Engines that ponder on a human's time; the others keep no transposition
+# table to ponder into.
+PONDER_ENGINES = ('alphabeta', 'pvs', 'competition')
+
+# Engine players of a worker process, most recently used last, keyed by
+# (match id, player).
+_players = collections.OrderedDict()
+
+# Geometries of the matches a worker process has searched, most recently
+# used last, keyed by match id.
+_geometries = collections.OrderedDict()
+
+
+def parse_side(side):
+	"""Parses a NEW side argument.
+
+	Args:
+		side: 'human', or an engine name optionally followed by ':' and a
+			search depth.
+
+	Returns:
+		None for a human side, otherwise a tuple (engine name, depth).
+
+	Raises:
+		ValueError: side names no known engine or has a bad depth.
+	"""
+	if side == 'human':
+		return None
+	name, _, depth = side.partition(':')
+	if name not in ENGINES:
+		raise ValueError('unknown engine {}'.format(name))
+	if not depth:
+		return name, DEFAULT_DEPTH
+	if not depth.isdigit() or int(depth) < 1:
+		raise ValueError('bad depth {}'.format(depth))
+	return name, int(depth)
+
+
+def parse_move(board, cell, move_type):
+	"""Parses a MOVE command's cell and type into a legal Action.
+
+	Raises:
+		ValueError: the move is malformed or not legal on board.
+	"""
+	cell = cell.upper()
+	move_type = move_type.upper()[:1]
+	if len(cell) < 2 or not cell[0].isalpha() or not cell[1:].isdigit() \
+		or move_type not in ('S', 'R'):
+		raise ValueError('bad move {} {}'.format(cell, move_type))
+	action = Action((int(cell[1:]) - 1, ord(cell[0]) - 65), move_type, \
+		board.turn)
+	if action not in board.actions():
+		raise ValueError('illegal move {}'.format(action))
+	return action
+
+
+def engine_player(key, engine, my_player):
+	"""Returns the cached player of an engine in a worker process.
+
+	Args:
+		key: a tuple (match id, player) identifying the engine.
+		engine: a tuple (engine name, depth) as returned by parse_side.
+		my_player: the player ('X' or 'O') the engine plays.
+	"""
+	player = _players.pop(key, None)
+	if player is None:
+		name, depth = engine
+		opponent = 'O' if my_player == 'X' else 'X'
+		player = ENGINES[name](my_player, opponent, depth)
+	_players[key] = player
+	while len(_players) > PLAYER_CACHE:
+		_players.popitem(last=False)
+	return player
+
+
+def match_board(match_id, values, code):
+	"""Rebuilds a match's board in a worker process.
+
+	The values grid arrives as a new object with every task, so the
+	Geometry built from it is kept for the match rather than built again
+	for every move.
+
+	Args:
+		match_id: the integer id of the match.
+		values: the 2D values grid of the match.
+		code: the board, packed by Board.encode.
+	"""
+	geometry = _geometries.pop(match_id, None)
+	if geometry is None or geometry.values != values:
+		geometry = Geometry(values)
+	_geometries[match_id] = geometry
+	while len(_geometries) > PLAYER_CACHE:
+		_geometries.popitem(last=False)
+	return Board.decode(code, geometry.values, geometry)
+
+
+def timed_search(player, board, seconds):
+	"""Searches an engine's move under the per-move time control.
+
+	Timed engines keep to the control by themselves. A depth-limited
+	engine is stopped once it overruns the control and its grace period,
+	by which time the match has been lost on time, so that the worker is
+	free for other matches rather than finishing a search nobody waits
+	for.
+
+	Returns:
+		A tuple as returned by search_move, or None if the search was
+		stopped.
+	"""
+	set_move_time(player, board, seconds)
+	start = time.time()
+	stoppable = not hasattr(player, 'cpu_remaining') and \
+		hasattr(player, 'cutoff_test')
+	if stoppable:
+		deadline = start + seconds + GRACE_SECONDS
+		cutoff_test = player.cutoff_test
+
+		def deadline_cutoff_test(state, curr_depth):
+			if time.time() >= deadline:
+				raise SearchTimeout()
+			return cutoff_test(state, curr_depth)
+
+		player.cutoff_test = deadline_cutoff_test
+	try:
+		action = player.search(board)
+	except SearchTimeout:
+		return None
+	finally:
+		if stoppable:
+			# drop the wrapper so the class's cutoff_test is used again
+			del player.cutoff_test
+	return action.encode(board.n), time.time() - start
+
+
+def search_move(key, engine, values, code, seconds):
+	"""Chooses an engine's move; runs in a worker process.
+
+	Args:
+		key: a tuple (match id, player) identifying the engine.
+		engine: a tuple (engine name, depth) as returned by parse_side.
+		values: the 2D values grid of the match.
+		code: the board to move on, packed by Board.encode.
+		seconds: the per-move time control.
+
+	Returns:
+		A tuple of the chosen action, packed by Action.encode, and the
+		seconds the search took, or None if the search overran the time
+		control and was stopped.
+	"""
+	board = match_board(key[0], values, code)
+	player = engine_player(key, engine, board.turn)
+	return timed_search(player, board, seconds)
+
+
+def ponder_move(key, engine, values, code, seconds, moves):
+	"""Ponders while a human moves, then chooses the engine's reply; runs
+	in a worker process.
+
+	Args:
+		key, engine, values, seconds: as in search_move.
+		code: the board the human is to move on, packed by Board.encode.
+		moves: a queue the human's move is put on, packed by
+			Action.encode, or None if the match ended instead.
+
+	Returns:
+		A tuple as returned by search_move, or None if no reply is needed
+		or the search was stopped.
+	"""
+	board = match_board(key[0], values, code)
+	player = engine_player(key, engine, board.opponent)
+	Ponderer(player).ponder(board, lambda: not moves.empty())
+	move = moves.get()
+	if move is None:
+		return None
+	board = board.transition(Action.decode(move, board.n, board.turn))
+	if board.terminal():
+		return None
+	return timed_search(player, board, seconds)
+
+
+class PonderPool:
+	"""The worker processes engines ponder in, apart from the search pool.
+
+	Attributes:
+		executor: the concurrent.futures executor ponderers run in.
+		manager: the multiprocessing.Manager making the queues that pass
+			human moves to the ponderers.
+		workers: the integer number of engines that may ponder at once.
+		busy: the integer number of engines pondering.
+	"""
+	def __init__(self, workers):
+		self.executor = concurrent.futures.ProcessPoolExecutor(workers)
+		self.manager = multiprocessing.Manager()
+		self.workers = workers
+		self.busy = 0
+
+	def queue(self):
+		"""Returns a new queue for passing human moves to a ponderer."""
+		return self.manager.Queue()
+
+	def submit(self, *args):
+		"""Starts ponder_move in a free worker.
+
+		Args:
+			args: the arguments of ponder_move.
+
+		Returns:
+			The future of ponder_move's result, or None if every worker is
+			busy, since a ponderer queued behind the others would not start
+			before the human moved and would hold up the engine's reply.
+		"""
+		if self.busy >= self.workers:
+			return None
+		self.busy += 1
+		loop = asyncio.get_running_loop()
+		# counted free when the worker is, even if the match stopped
+		# waiting for it
+		future = self.executor.submit(ponder_move, *args)
+		future.add_done_callback(lambda future: \
+			loop.call_soon_threadsafe(self.release))
+		return asyncio.wrap_future(future)
+
+	def release(self):
+		self.busy -= 1
+
+	def shutdown(self):
+		self.executor.shutdown(wait=False)
+		self.manager.shutdown()
+
+
+def format_rows(rows):
+	"""Formats board rows as one protocol word."""
+	return '/'.join(rows)
+
+
+class Match:
+	"""One game hosted by the server.
+
+	Attributes:
+		id: the integer id of the match.
+		sides: a dict mapping a player ('X' or 'O') to its engine, a tuple
+			(engine name, depth), or None for a human side.
+		specs: a dict mapping a player to its side as given to NEW.
+		seconds: a float of the per-move time control.
+		board: the Board of the current position.
+		subscribers: a set of the StreamWriters of the clients watching.
+		human_moves: an asyncio.Queue of the Actions played by human sides.
+		ponder_pool: the PonderPool engines of the match ponder in, or None
+			if they do not ponder.
+		ponder_moves: a multiprocessing queue passing human moves to the
+			worker pondering them, or None if engines do not ponder.
+		pondering: the future of the pondering engine's next move, or
+			None.
+		result: the OVER message once the match has ended, else None.
+		task: the asyncio.Task playing the match.
+	"""
+	def __init__(self, match_id, specs, seconds, n=None, seed=None):
+		self.id = match_id
+		self.specs = specs
+		self.sides = dict((player, parse_side(spec)) \
+			for player, spec in specs.items())
+		self.seconds = seconds
+		state, values, n = random_board(blank=True, n=n, \
+			rng=random.Random(seed))
+		self.board = Board(n, state, values, 'X')
+		self.subscribers = set()
+		self.human_moves = asyncio.Queue()
+		self.ponder_pool = None
+		self.ponder_moves = None
+		self.pondering = None
+		self.result = None
+		self.task = None
+
+	def send(self, message):
+		"""Sends a message to every subscriber."""
+		data = (message + '\n').encode('ascii')
+		for writer in list(self.subscribers):
+			if writer.is_closing():
+				self.subscribers.discard(writer)
+			else:
+				writer.write(data)
+
+	def values_message(self):
+		return 'VALUES {} {}'.format(self.id, format_rows( \
+			','.join(str(value) for value in row) \
+			for row in self.board.values))
+
+	def state_message(self):
+		board = self.board
+		return 'STATE {} {} {} {} {}'.format(self.id, board.turn, \
+			board.scores['X'], board.scores['O'], \
+			format_rows(''.join(row) for row in board.state))
+
+	def finish(self, winner, reason):
+		board = self.board
+		self.result = 'OVER {} {} {} {} {}'.format(self.id, winner, \
+			board.scores['X'], board.scores['O'], reason)
+		self.send(self.result)
+
+	def ponder(self):
+		"""Starts the engine facing the human to move pondering, if it
+		should and a ponder worker is free.
+		"""
+		board = self.board
+		engine = self.sides[board.opponent]
+		if self.ponder_pool is None or engine is None or \
+			engine[0] not in PONDER_ENGINES or board.remaining_spaces < 2:
+			return
+		self.pondering = self.ponder_pool.submit((self.id, board.opponent), \
+			engine, board.values, board.encode(), self.seconds, \
+			self.ponder_moves)
+
+	def stop_pondering(self, action=None):
+		"""Passes the human's move, or None to give up, to the pondering
+		engine.
+		"""
+		if self.pondering is not None:
+			self.ponder_moves.put(None if action is None else \
+				action.encode(self.board.n))
+			if action is None:
+				self.pondering = None
+
+	async def run(self, executor):
+		"""Plays the match out, sending its events to the subscribers."""
+		try:
+			await self.play(executor)
+		finally:
+			self.stop_pondering()
+
+	async def play(self, executor):
+		loop = asyncio.get_running_loop()
+		self.send(self.values_message())
+		self.send(self.state_message())
+		while not self.board.terminal():
+			board = self.board
+			turn = board.turn
+			engine = self.sides[turn]
+			try:
+				if engine is None:
+					self.send('TURN {} {}'.format(self.id, turn))
+					self.ponder()
+					start = time.time()
+					action = await asyncio.wait_for(self.human_moves.get(), \
+						self.seconds)
+					seconds = time.time() - start
+					self.stop_pondering(action)
+				else:
+					if self.pondering is not None:
+						future = self.pondering
+						self.pondering = None
+					else:
+						future = loop.run_in_executor(executor, search_move, \
+							(self.id, turn), engine, board.values, \
+							board.encode(), self.seconds)
+					result = await asyncio.wait_for(future, \
+						self.seconds + GRACE_SECONDS)
+					if result is None:
+						# the worker stopped a search that overran
+						raise asyncio.TimeoutError()
+					code, seconds = result
+					action = Action.decode(code, board.n, turn)
+			except asyncio.TimeoutError:
+				self.finish(board.opponent, 'timeout')
+				return
+			except Exception:
+				self.finish(board.opponent, 'error')
+				raise
+			self.board = board.transition(action)
+			self.send('MOVED {} {} {} {} {:.3f}'.format(self.id, turn, \
+				action.string_position(), '{}'.format(action).split()[1], \
+				seconds))
+			self.send(self.state_message())
+		scores = self.board.scores
+		if scores['X'] > scores['O']:
+			winner = 'X'
+		elif scores['O'] > scores['X']:
+			winner = 'O'
+		else:
+			winner = 'DRAW'
+		self.finish(winner, 'end')
+
+
+class MatchServer:
+	"""Accepts client connections and runs their matches.
+
+	Attributes:
+		executor: the concurrent.futures executor engine searches run in.
+		ponder_pool: the PonderPool engines ponder in, or None if they do
+			not ponder.
+		matches: a dict mapping match ids to the Matches being played.
+	"""
+	def __init__(self, executor, ponder_pool=None):
+		self.executor = executor
+		self.ponder_pool = ponder_pool
+		self.matches = {}
+		self.ids = itertools.count(1)
+
+	def match(self, match_id):
+		"""Returns the match being played with an id given as a string."""
+		if not match_id.isdigit() or int(match_id) not in self.matches:
+			raise ValueError('no match {}'.format(match_id))
+		return self.matches[int(match_id)]
+
+	def start(self, args, writer):
+		"""Handles NEW, returning the id of the new match."""
+		if len(args) < 3 or len(args) > 5:
+			raise ValueError('usage: NEW <X side> <O side> <seconds> ' \
+				'[<n> [<seed>]]')
+		seconds = float(args[2])
+		if seconds <= 0:
+			raise ValueError('seconds must be positive')
+		n = int(args[3]) if len(args) > 3 else None
+		if n is not None and not 3 <= n <= 26:
+			raise ValueError('n must be from 3 to 26')
+		seed = int(args[4]) if len(args) > 4 else None
+		match = Match(next(self.ids), {'X': args[0], 'O': args[1]}, \
+			seconds, n, seed)
+		if self.ponder_pool is not None and None in match.sides.values():
+			match.ponder_pool = self.ponder_pool
+			match.ponder_moves = self.ponder_pool.queue()
+		match.subscribers.add(writer)
+		self.matches[match.id] = match
+		match.task = asyncio.ensure_future(match.run(self.executor))
+		match.task.add_done_callback(lambda task: self.ended(match))
+		return match.id
+
+	def ended(self, match):
+		"""Forgets a match once its task is done."""
+		self.matches.pop(match.id, None)
+		if not match.task.cancelled() and match.task.exception() is not None:
+			sys.stderr.write('match {} failed: {!r}\n'.format(match.id, \
+				match.task.exception()))
+
+	def command(self, line, writer):
+		"""Carries out one client command.
+
+		Returns:
+			The OK reply to send, an empty string for a blank line, or None
+			if the client asked to close the connection.
+
+		Raises:
+			ValueError: the command is malformed or cannot be carried out.
+		"""
+		words = line.split()
+		if not words:
+			return ''
+		name = words[0].upper()
+		args = words[1:]
+		if name == 'QUIT':
+			return None
+		elif name == 'NEW':
+			return 'OK {}'.format(self.start(args, writer))
+		elif name == 'LIST':
+			for match in list(self.matches.values()):
+				writer.write('MATCH {} {} {} {}\n'.format(match.id, \
+					match.specs['X'], match.specs['O'], \
+					match.board.turn).encode('ascii'))
+		elif name in ('WATCH', 'BOARD', 'MOVE', 'RESIGN') and args:
+			match = self.match(args[0])
+			if name == 'WATCH':
+				match.subscribers.add(writer)
+			if name in ('WATCH', 'BOARD'):
+				for message in (match.values_message(), match.state_message()):
+					writer.write((message + '\n').encode('ascii'))
+			elif name == 'RESIGN':
+				humans = [player for player in ('X', 'O') \
+					if match.sides[player] is None]
+				if len(humans) == 1:
+					loser = humans[0]
+				else:
+					loser = match.board.turn
+				match.task.cancel()
+				match.finish('O' if loser == 'X' else 'X', 'resign')
+			else:
+				if len(args) != 3:
+					raise ValueError('usage: MOVE <match> <cell> <S|R>')
+				if match.sides[match.board.turn] is not None or \
+					match.human_moves.qsize():
+					raise ValueError('not a human turn in match {}'.format( \
+						match.id))
+				match.human_moves.put_nowait(parse_move(match.board, \
+					args[1], args[2]))
+		else:
+			raise ValueError('unknown command {}'.format(line.strip()))
+		return 'OK'
+
+	async def handle(self, reader, writer):
+		"""Serves one client connection until it closes."""
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				try:
+					reply = self.command(line.decode('ascii', 'replace'), \
+						writer)
+				except ValueError as e:
+					reply = 'ERROR {}'.format(e)
+				if reply is None:
+					break
+				if reply:
+					writer.write((reply + '\n').encode('ascii'))
+				await writer.drain()
+		except ConnectionError:
+			pass
+		finally:
+			for match in list(self.matches.values()):
+				match.subscribers.discard(writer)
+				if not match.subscribers:
+					match.task.cancel()
+			writer.close()
+
+
+async def serve(args):
+	executor = concurrent.futures.ProcessPoolExecutor(args.workers)
+	if args.no_ponder or args.ponder_workers < 1:
+		ponder_pool = None
+	else:
+		ponder_pool = PonderPool(args.ponder_workers)
+	server = MatchServer(executor, ponder_pool)
+	if args.unix is not None:
+		listener = await asyncio.start_unix_server(server.handle, args.unix)
+		where = args.unix
+	else:
+		listener = await asyncio.start_server(server.handle, args.host, \
+			args.port)
+		where = '{}:{}'.format(args.host, args.port)
+	sys.stderr.write('serving on {}\n'.format(where))
+	try:
+		async with listener:
+			await listener.serve_forever()
+	finally:
+		executor.shutdown(wait=False)
+		if ponder_pool is not None:
+			ponder_pool.shutdown()
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Host Gang War matches ' \
+		'over a line protocol.')
+	parser.add_argument('--host', default='127.0.0.1', \
+		help='address to listen on (default: %(default)s)')
+	parser.add_argument('--port', type=int, default=5610, \
+		help='TCP port to listen on (default: %(default)s)')
+	parser.add_argument('--unix', metavar='PATH', \
+		help='listen on a Unix socket instead of TCP')
+	parser.add_argument('--workers', type=int, \
+		default=multiprocessing.cpu_count(), \
+		help='engine worker processes (default: one per core)')
+	parser.add_argument('--ponder-workers', type=int, \
+		default=max(1, multiprocessing.cpu_count() // 2), \
+		help='processes engines ponder in, apart from the engine workers ' \
+		'(default: one per two cores)')
+	parser.add_argument('--no-ponder', action='store_true', \
+		help="do not search on human players' time")
+	args = parser.parse_args(argv)
+	try:
+		asyncio.run(serve(args))
+	except KeyboardInterrupt:
+		pass
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -1,18 +1,18 @@
 from termcolor import colored
 from random_board import random_board
 import sys
-from homework import Board, Action, AlphaBetaPlayer
+from homework import Board, Action, AlphaBetaPlayer, MoveOrderer, Ponderer
 
 def print_board():
 	sys.stdout.write(colored('\t{}'.format('\t'.join([chr(65+i) for i in range(n)])), 'red', 'on_white', attrs=['underline']))
-	print ''
+	print('')
 	for row in range(n):
 		sys.stdout.write(colored('{}\t'.format(row+1), 'red', 'on_white'))
 		for col in range(n):
 			if board.state[row][col] == 'X':
 				sys.stdout.write(colored('{}'.format(values[row][col]), 'white', 'on_green'))
 			elif board.state[row][col] == 'O':
-				sys.stdout.write(colored('{}'.format(values[row][col]), 'white', 'on_red'))		
+				sys.stdout.write(colored('{}'.format(values[row][col]), 'white', 'on_red'))
 			else:
 				sys.stdout.write('{}'.format(values[row][col]))
 			sys.stdout.write('\t')
@@ -32,29 +32,33 @@ def valid_input(input_action):
 
 state, values, n = random_board(blank=True)
 board = Board(n, state, values, 'X')
-ai = AlphaBetaPlayer('O', 'X', 4)
+ai = AlphaBetaPlayer('O', 'X', 4, orderer=MoveOrderer())
+# the bot searches the replies to its last move while the human types;
+# run with --no-ponder to leave it idle instead
+ponderer = None if '--no-ponder' in sys.argv[1:] else Ponderer(ai)
 print_board()
 while not board.terminal():
-	print "{}'s turn!".format(board.turn)
+	print("{}'s turn!".format(board.turn))
 	if board.turn == 'X':
-		input_action = raw_input("Input move (e.g. B2 S) or 'QUIT': ").upper()
+		if ponderer is not None:
+			ponderer.start(board)
+		input_action = input("Input move (e.g. B2 S) or 'QUIT': ").upper()
 		while not valid_input(input_action):
-			input_action = raw_input("Invalid move, try again: ").upper()
+			input_action = input("Invalid move, try again: ").upper()
 		if input_action == 'QUIT':
 			break
 		else:
 			position, action_type = input_action.split()
-			piece_position = (int(position[1])-1, ord(position[0])-65)
+			piece_position = (int(position[1:])-1, ord(position[0])-65)
 			action = Action(piece_position, action_type, board.turn)
+		if ponderer is not None:
+			depth = ponderer.stop(action)
+			if depth:
+				print('(pondered this move to depth {})'.format(depth))
 	else:
-		action = ai.alpha_beta_search(board)
-	print '{} {}s at {}'.format(action.player, str(action).split()[1], str(action).split()[0])
+		action = ai.search(board)
+	print('{} {}s at {}'.format(action.player, str(action).split()[1], str(action).split()[0]))
 	board = board.transition(action)
 	print_board()
-
-
-
-
-
-
-
+if ponderer is not None:
+	ponderer.stop()
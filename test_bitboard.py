@@ -0,0 +1,130 @@
+"""
+File: test_bitboard.py
+---------------
+Checks that BitBoard behaves exactly like the list-based Board: the same
+moves in the same order, the same positions, scores and Zobrist keys
+after applying and undoing them, and the same moves chosen by a search.
+Positions and games are drawn from fixed seeds, so a failure can be
+replayed.
+
+Usage:
+
+	python -m unittest test_bitboard
+"""
+import random
+import unittest
+
+from homework import Board, BitBoard, MinimaxPlayer, AlphaBetaPlayer, \
+	MoveOrderer
+from random_board import random_board
+
+SEED = 561
+GAMES = 40
+
+
+def make_boards(n, state, values, turn):
+	"""Builds a Board and a BitBoard of the same position."""
+	scores = {'X': 0, 'O': 0}
+	remaining_spaces = n*n
+	for row in range(n):
+		for col in range(n):
+			if state[row][col] != '.':
+				remaining_spaces -= 1
+				scores[state[row][col]] += values[row][col]
+	return [board_class(n, [list(row) for row in state], values, turn, \
+		remaining_spaces=remaining_spaces, scores=dict(scores)) \
+		for board_class in (Board, BitBoard)]
+
+
+def random_position(rng):
+	"""Draws a position with at least one empty cell and a Board and
+	BitBoard of it.
+	"""
+	state, values, n = random_board(n=rng.randint(3, 6), \
+		fill=rng.choice([0.0, 0.3, 0.6]), rng=rng)
+	if all(owner != '.' for row in state for owner in row):
+		state[rng.randrange(n)][rng.randrange(n)] = '.'
+	return make_boards(n, state, values, rng.choice(['X', 'O']))
+
+
+def moves_of(board):
+	moves = [0] * (2*board.n*board.n)
+	count = board.generate_moves(moves)
+	return moves[:count]
+
+
+def snapshot(board):
+	"""Returns the parts of a position both backends must agree on."""
+	return (board.cells, board.turn, board.opponent, board.remaining_spaces, \
+		dict(board.scores), board.terminal())
+
+
+class BitBoardParityTest(unittest.TestCase):
+
+	def assertSamePosition(self, board, bitboard):
+		self.assertEqual(snapshot(board), snapshot(bitboard))
+		# Boards of symmetric values hash their canonical view instead
+		if not board.geometry.symmetries:
+			self.assertEqual(board.zobrist, bitboard.zobrist)
+
+	def test_random_games(self):
+		rng = random.Random(SEED)
+		for game in range(GAMES):
+			board, bitboard = random_position(rng)
+			history = []
+			while True:
+				self.assertSamePosition(board, bitboard)
+				moves = moves_of(board)
+				self.assertEqual(moves, moves_of(bitboard))
+				for move in moves:
+					self.assertEqual(board.move_gain(move), \
+						bitboard.move_gain(move))
+				if board.terminal():
+					break
+				history.append((snapshot(board), board.zobrist, \
+					bitboard.zobrist))
+				move = rng.choice(moves)
+				board.apply_move(move)
+				bitboard.apply_move(move)
+			# undoing every move must give back each earlier position
+			while history:
+				board.undo()
+				bitboard.undo()
+				position, zobrist, bitboard_zobrist = history.pop()
+				self.assertEqual(snapshot(board), position)
+				self.assertEqual(snapshot(bitboard), position)
+				self.assertEqual(board.zobrist, zobrist)
+				self.assertEqual(bitboard.zobrist, bitboard_zobrist)
+			self.assertFalse(board.undo_stack)
+			self.assertFalse(bitboard.undo_stack)
+
+	def test_transitions(self):
+		rng = random.Random(SEED + 1)
+		for game in range(GAMES):
+			board, bitboard = random_position(rng)
+			while not board.terminal():
+				actions = list(board.actions())
+				self.assertEqual(actions, list(bitboard.actions()))
+				action = rng.choice(actions)
+				board = board.transition(action)
+				bitboard = bitboard.transition(action)
+				self.assertSamePosition(board, bitboard)
+
+	def test_chosen_moves(self):
+		rng = random.Random(SEED + 2)
+		players = [
+			lambda me, opponent: MinimaxPlayer(me, opponent, 2),
+			lambda me, opponent: AlphaBetaPlayer(me, opponent, 3),
+			lambda me, opponent: AlphaBetaPlayer(me, opponent, 3, \
+				orderer=MoveOrderer()),
+		]
+		for game in range(GAMES):
+			board, bitboard = random_position(rng)
+			make_player = players[game % len(players)]
+			decisions = [make_player(position.turn, position.opponent) \
+				.search(position) for position in (board, bitboard)]
+			self.assertEqual(decisions[0], decisions[1])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,295 @@
+"""
+File: tournament.py
+---------------
+Plays engine configurations against each other to compare their strength.
+
+Usage:
+
+	python tournament.py [options] ENGINE ENGINE [ENGINE ...]
+
+where each ENGINE is an engine of server.ENGINES, optionally with a search
+depth, e.g. 'minimax:2' or 'alphabeta:4'. Every pair of engines plays every
+start position twice, once with each engine as X (who moves first).
+
+Start positions are drawn with random_board from --seed, and engines
+that play randomly (e.g. 'mcts') draw from seeds derived from it and the
+game number, so a tournament can be replayed exactly: boards of the
+--sizes, left blank or filled to --fill. Games are played by a pool of worker processes and each finished
+game is written as soon as it ends, as one JSON object per line, to --log
+(or nowhere):
+
+	{"game": ..., "position": ..., "n": ..., "X": "alphabeta:3",
+		"O": "minimax:2", "winner": "X", "scores": {"X": ..., "O": ...},
+		"moves": {"X": ..., "O": ...}, "seconds": {"X": ..., "O": ...},
+		"max_seconds": {"X": ..., "O": ...}}
+
+At the end a table gives, for each engine, its games, wins, draws and
+losses, its Elo rating, its average margin (own score minus opponent's)
+and its average and worst move latency. Engines searching with a time
+control (e.g. 'competition' and 'mcts') get --seconds per move, as in
+server.py (see homework.set_move_time), which makes it possible to check
+that a faster search plays stronger at a fixed time. Timed engines
+depend on the clock, so only fixed-depth engines replay move for move.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+from homework import Board, set_move_time
+from random_board import random_board
+from benchmark import make_board
+from server import ENGINES, parse_side
+
+SEED = 561
+POSITIONS = 10
+SIZES = [4, 5]
+SECONDS = 1.0
+
+# Elo rating every engine starts from, and how far one game moves it.
+ELO_START = 1500.0
+ELO_K = 16.0
+
+
+def start_positions(seed, count, sizes, fill):
+	"""Draws the start positions of a tournament.
+
+	Args:
+		seed: the integer seed the positions are drawn from.
+		count: the number of positions.
+		sizes: the board sizes to cycle through.
+		fill: the chance [0, 1) of each cell being occupied, 0 for blank
+			boards.
+
+	Returns:
+		A list of position dicts as taken by benchmark.make_board, each
+		with X to move and at least one empty cell.
+	"""
+	rng = random.Random(seed)
+	positions = []
+	for index in range(count):
+		n = sizes[index % len(sizes)]
+		state, values, n = random_board(blank=not fill, n=n, fill=fill, \
+			rng=rng)
+		if all(owner != '.' for row in state for owner in row):
+			state[rng.randrange(n)][rng.randrange(n)] = '.'
+		positions.append({'n': n, 'state': state, 'values': values, \
+			'turn': 'X'})
+	return positions
+
+
+def schedule(engines, positions):
+	"""Lists the games of a tournament.
+
+	Returns:
+		A list of tuples (game, position index, X engine, O engine), where
+		every pair of engines plays every position with both colors.
+	"""
+	games = []
+	for first, second in itertools.combinations(engines, 2):
+		for index in range(len(positions)):
+			games.append((index, first, second))
+			games.append((index, second, first))
+	return [(game,) + games[game] for game in range(len(games))]
+
+
+def play_game(task):
+	"""Plays one game.
+
+	Args:
+		task: a tuple (game, position index, X engine, O engine, position
+			dict, seconds per move for timed engines, tournament seed).
+
+	Returns:
+		The dict written to the log for the game.
+	"""
+	game, index, x_engine, o_engine, position, seconds, seed = task
+	board = make_board(Board, position)
+	players = {}
+	for player, engine in (('X', x_engine), ('O', o_engine)):
+		name, depth = parse_side(engine)
+		opponent = 'O' if player == 'X' else 'X'
+		players[player] = ENGINES[name](player, opponent, depth)
+		if hasattr(players[player], 'rng'):
+			players[player].rng = random.Random('{}:{}:{}'.format(seed, \
+				game, player))
+	moves = {'X': 0, 'O': 0}
+	total = {'X': 0.0, 'O': 0.0}
+	worst = {'X': 0.0, 'O': 0.0}
+	while not board.terminal():
+		player = players[board.turn]
+		set_move_time(player, board, seconds)
+		start = time.time()
+		action = player.search(board)
+		elapsed = time.time() - start
+		moves[board.turn] += 1
+		total[board.turn] += elapsed
+		worst[board.turn] = max(worst[board.turn], elapsed)
+		board = board.transition(action)
+	scores = board.scores
+	if scores['X'] > scores['O']:
+		winner = 'X'
+	elif scores['O'] > scores['X']:
+		winner = 'O'
+	else:
+		winner = 'DRAW'
+	return {
+		'game': game,
+		'position': index,
+		'n': board.n,
+		'X': x_engine,
+		'O': o_engine,
+		'winner': winner,
+		'scores': {'X': scores['X'], 'O': scores['O']},
+		'moves': moves,
+		'seconds': total,
+		'max_seconds': worst,
+	}
+
+
+def elo_ratings(engines, results):
+	"""Rates engines from their game results.
+
+	Games are replayed in the order of their game numbers, updating both
+	players' ratings after each, so the ratings do not depend on the
+	order games finished in.
+
+	Returns:
+		A dict mapping each engine to its Elo rating.
+	"""
+	ratings = dict((engine, ELO_START) for engine in engines)
+	for result in sorted(results, key=lambda result: result['game']):
+		x, o = result['X'], result['O']
+		expected = 1.0 / (1 + 10 ** ((ratings[o] - ratings[x]) / 400.0))
+		if result['winner'] == 'X':
+			actual = 1.0
+		elif result['winner'] == 'O':
+			actual = 0.0
+		else:
+			actual = 0.5
+		ratings[x] += ELO_K * (actual - expected)
+		ratings[o] -= ELO_K * (actual - expected)
+	return ratings
+
+
+def summarize(engines, results):
+	"""Totals the results of each engine.
+
+	Returns:
+		A dict mapping each engine to a dict of its 'games', 'wins',
+		'draws', 'losses', 'elo', average 'margin', average 'latency' and
+		'max_latency' in seconds.
+	"""
+	ratings = elo_ratings(engines, results)
+	summary = {}
+	for engine in engines:
+		games = wins = draws = margin = moves = 0
+		seconds = worst = 0.0
+		for result in results:
+			for player, opponent in (('X', 'O'), ('O', 'X')):
+				if result[player] != engine:
+					continue
+				games += 1
+				if result['winner'] == player:
+					wins += 1
+				elif result['winner'] == 'DRAW':
+					draws += 1
+				margin += result['scores'][player] - result['scores'][opponent]
+				moves += result['moves'][player]
+				seconds += result['seconds'][player]
+				worst = max(worst, result['max_seconds'][player])
+		summary[engine] = {
+			'games': games,
+			'wins': wins,
+			'draws': draws,
+			'losses': games - wins - draws,
+			'elo': ratings[engine],
+			'margin': float(margin) / games if games else 0.0,
+			'latency': seconds / moves if moves else 0.0,
+			'max_latency': worst,
+		}
+	return summary
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Play a round-robin ' \
+		'tournament between Gang War engines.')
+	parser.add_argument('engines', nargs='+', metavar='ENGINE', \
+		help="engine with an optional depth, e.g. 'alphabeta:3'")
+	parser.add_argument('--positions', type=int, default=POSITIONS, \
+		help='start positions per pairing (default: %(default)s)')
+	parser.add_argument('--seed', type=int, default=SEED, \
+		help='seed of the start positions (default: %(default)s)')
+	parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, \
+		help='board sizes (default: %(default)s)')
+	parser.add_argument('--fill', type=float, default=0.0, \
+		help='chance of each start cell being occupied (default: blank)')
+	parser.add_argument('--seconds', type=float, default=SECONDS, \
+		help='per-move time of timed engines (default: %(default)s)')
+	parser.add_argument('--workers', type=int, \
+		default=multiprocessing.cpu_count(), \
+		help='number of worker processes (default: one per core)')
+	parser.add_argument('--log', metavar='FILE', \
+		help='write each game as a JSON line to FILE')
+	args = parser.parse_args(argv)
+
+	engines = list(args.engines)
+	if len(set(engines)) != len(engines) or len(engines) < 2:
+		parser.error('give at least two different engines')
+	for engine in engines:
+		try:
+			if parse_side(engine) is None:
+				raise ValueError('not an engine: human')
+		except ValueError as e:
+			parser.error(str(e))
+	positions = start_positions(args.seed, args.positions, args.sizes, \
+		args.fill)
+	tasks = [game + (positions[game[1]], args.seconds, args.seed) \
+		for game in schedule(engines, positions)]
+
+	log = open(args.log, 'w') if args.log else None
+	if args.workers <= 1:
+		pool = None
+		games = (play_game(task) for task in tasks)
+	else:
+		pool = multiprocessing.Pool(args.workers)
+		games = pool.imap_unordered(play_game, tasks)
+	results = []
+	start = time.time()
+	try:
+		for result in games:
+			results.append(result)
+			if log is not None:
+				log.write(json.dumps(result, sort_keys=True) + '\n')
+				log.flush()
+			sys.stderr.write('{:4d}/{} game {}: {} v {} -> {}\n'.format( \
+				len(results), len(tasks), result['game'], result['X'], \
+				result['O'], result['winner']))
+	finally:
+		if pool is not None:
+			pool.close()
+			pool.join()
+		if log is not None:
+			log.close()
+	elapsed = time.time() - start
+
+	summary = summarize(engines, results)
+	print('{:20} {:>5} {:>5} {:>5} {:>6} {:>7} {:>8} {:>9} {:>9}'.format( \
+		'engine', 'games', 'wins', 'draws', 'losses', 'elo', 'margin', \
+		'avg move', 'max move'))
+	for engine in sorted(engines, key=lambda engine: -summary[engine]['elo']):
+		row = summary[engine]
+		print('{:20} {:5d} {:5d} {:5d} {:6d} {:7.1f} {:8.1f} {:8.3f}s ' \
+			'{:8.3f}s'.format(engine, row['games'], row['wins'], \
+			row['draws'], row['losses'], row['elo'], row['margin'], \
+			row['latency'], row['max_latency']))
+	print('{} games in {:.1f}s ({:.2f} games/s)'.format(len(results), \
+		elapsed, len(results) / elapsed if elapsed else 0.0))
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())